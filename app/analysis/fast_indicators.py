@@ -0,0 +1,227 @@
+# --- START OF FILE app/analysis/fast_indicators.py ---
+# 策略热路径使用的 numba 指标内核，直接在 float64 数组上计算，结果与 pandas_ta 的默认实现一致。
+# 输入为不含 NaN 的 OHLC 数组，输出与输入等长，尚未形成的部分为 NaN。
+# 内核以 nogil 编译，扫描线程池中的多个线程可以真正并行计算指标，不必为此改用多进程。
+import numpy as np
+from numba import njit
+
+_EPSILON = np.finfo(np.float64).eps
+
+
+@njit(cache=True, nogil=True)
+def _sma_seeded_ewm(x, length, alpha):
+    # 以前 length 个值的 SMA 作为种子，之后按 alpha 递推 (对应 pandas ewm(adjust=False))
+    n = x.size
+    out = np.full(n, np.nan)
+    if n < length:
+        return out
+    prev = 0.0
+    for i in range(length):
+        prev += x[i]
+    prev /= length
+    out[length - 1] = prev
+    for i in range(length, n):
+        prev = alpha * x[i] + (1.0 - alpha) * prev
+        out[i] = prev
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _rma(x, length, adjust):
+    # pandas_ta 的两种 RMA (alpha = 1/length)，按 pandas ewm(ignore_na=False) 的权重递推，开头的 NaN 不计入：
+    # adjust=False 对应 pandas_ta.rma，即 ewm(adjust=False)，首个有效值即为种子、无 min_periods (RSI 使用)；
+    # adjust=True 对应 pandas_ta.utils.pd_rma，即 ewm(adjust=True, min_periods=length) (KDJ 使用)。
+    n = x.size
+    out = np.full(n, np.nan)
+    decay = 1.0 - 1.0 / length
+    new_weight = 1.0 if adjust else 1.0 / length
+    min_periods = length if adjust else 1
+    old_weight = 1.0
+    weighted = np.nan
+    count = 0
+    for i in range(n):
+        observed = not np.isnan(x[i])
+        if count > 0:
+            old_weight *= decay
+            if observed:
+                weighted = (old_weight * weighted + new_weight * x[i]) / (old_weight + new_weight)
+                old_weight = old_weight + new_weight if adjust else 1.0
+        elif observed:
+            weighted = x[i]
+        if observed:
+            count += 1
+        if count >= min_periods:
+            out[i] = weighted
+    return out
+
+
+@njit(cache=True, nogil=True)
+def ema(close, length):
+    """ 与 pandas_ta.ema 默认行为一致：SMA 种子 + alpha = 2/(length+1)。 """
+    return _sma_seeded_ewm(close, length, 2.0 / (length + 1))
+
+
+@njit(cache=True, nogil=True)
+def atr(high, low, close, length):
+    """ 与 pandas_ta.atr 默认行为一致 (ATRr)：真实波幅的 Wilder RMA，以 SMA 作为种子。 """
+    n = close.size
+    if n < length + 1:
+        return np.full(n, np.nan)
+    true_range = np.empty(n)
+    true_range[0] = abs(high[0] - low[0])
+    for i in range(1, n):
+        prev_close = close[i - 1]
+        true_range[i] = max(abs(high[i] - low[i]), abs(high[i] - prev_close), abs(prev_close - low[i]))
+    return _sma_seeded_ewm(true_range, length, 1.0 / length)
+
+
+@njit(cache=True, nogil=True)
+def kdj(high, low, close, length, signal):
+    """ 与 pandas_ta.kdj 一致 (K、D 经 pandas_ta.utils.pd_rma 平滑)，返回 (K, D)。 """
+    n = close.size
+    if n < length + signal + 1:
+        return np.full(n, np.nan), np.full(n, np.nan)
+    ranges = np.full(n, np.nan)
+    lowest = np.full(n, np.nan)
+    has_zero_range = False
+    for i in range(length - 1, n):
+        lowest[i] = low[i - length + 1:i + 1].min()
+        ranges[i] = high[i - length + 1:i + 1].max() - lowest[i]
+        if ranges[i] == 0.0:
+            has_zero_range = True
+    if has_zero_range:
+        # pandas_ta 的 non_zero_range：只要出现零区间，就给整列加上 epsilon
+        ranges += _EPSILON
+    fast_k = 100.0 * (close - lowest) / ranges
+    k = _rma(fast_k, signal, True)
+    d = _rma(k, signal, True)
+    return k, d
+
+
+@njit(cache=True, nogil=True)
+def rsi(close, length):
+    """
+    与 pandas_ta.rsi 默认行为一致 (mamode=rma)：涨跌幅分别经 pandas_ta.rma 平滑，
+    从第 2 根K线起即有输出；涨跌均为 0 时为 NaN (0/0)。
+    """
+    n = close.size
+    out = np.full(n, np.nan)
+    if n < length + 1:
+        return out
+    gains = np.full(n, np.nan)
+    losses = np.full(n, np.nan)
+    for i in range(1, n):
+        change = close[i] - close[i - 1]
+        gains[i] = change if change > 0.0 else 0.0
+        losses[i] = -change if change < 0.0 else 0.0
+    avg_gain = _rma(gains, length, False)
+    avg_loss = _rma(losses, length, False)
+    for i in range(1, n):
+        total = avg_gain[i] + avg_loss[i]
+        if total != 0.0:
+            out[i] = 100.0 * avg_gain[i] / total
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _last_unmitigated(ob_idx, check_from, levels, prices, is_bull):
+    # 从后往前找第一个之后从未被价格穿越 (多头: 最低价跌破 bottom；空头: 最高价突破 top) 的订单块
+    for j in range(ob_idx.size - 1, -1, -1):
+        mitigated = False
+        for k in range(check_from[j] + 1, prices.size):
+            if (is_bull and prices[k] < levels[j]) or (not is_bull and prices[k] > levels[j]):
+                mitigated = True
+                break
+        if not mitigated:
+            return j
+    return -1
+
+
+@njit(cache=True, nogil=True)
+def lux_order_blocks(high, low, volume, length):
+    """
+    与 order_blocks.find_lux_order_blocks 的原循环一致：成交量左右 length 根内为峰值的K线，
+    创出左侧新高记为空头 OB、创出左侧新低记为多头 OB。返回最后一个未失效的 (多头K线索引, 空头K线索引)，没有则为 -1。
+    """
+    n = volume.size
+    bull = np.empty(n, dtype=np.int64)
+    bear = np.empty(n, dtype=np.int64)
+    n_bull = 0
+    n_bear = 0
+    for i in range(length, n - length):
+        vol_center = volume[i]
+        if vol_center > volume[i - length:i].max() and vol_center > volume[i + 1:i + length + 1].max():
+            if high[i] >= high[i - length:i].max():
+                bear[n_bear] = i
+                n_bear += 1
+            elif low[i] <= low[i - length:i].min():
+                bull[n_bull] = i
+                n_bull += 1
+    bull = bull[:n_bull]
+    bear = bear[:n_bear]
+    # 多头 OB 的下沿为K线最低价，空头 OB 的上沿为K线最高价，失效判断从 OB 之后的K线开始
+    j_bull = _last_unmitigated(bull, bull, low[bull], low, True)
+    j_bear = _last_unmitigated(bear, bear, high[bear], high, False)
+    return (bull[j_bull] if j_bull >= 0 else -1), (bear[j_bear] if j_bear >= 0 else -1)
+
+
+@njit(cache=True, nogil=True)
+def flux_order_blocks(high, low, close, atr_values, swing_length, atr_multiplier):
+    """
+    与 order_blocks.find_flux_order_blocks 的原循环一致：收盘价突破最近的摆动高/低点 (BOS) 时，
+    回溯摆动点到突破前的最低/最高K线作为 OB，K线区间超过 atr_multiplier 倍 ATR 的丢弃。
+    返回 (多头OB索引, 多头突破索引, 空头OB索引, 空头突破索引)，没有则为 -1。
+    """
+    n = close.size
+    window = swing_length * 2 + 1
+    is_swing_high = np.zeros(n, dtype=np.bool_)
+    is_swing_low = np.zeros(n, dtype=np.bool_)
+    for j in range(swing_length, n - swing_length):
+        is_swing_high[j] = high[j] == high[j - swing_length:j - swing_length + window].max()
+        is_swing_low[j] = low[j] == low[j - swing_length:j - swing_length + window].min()
+
+    bull_ob = np.empty(n, dtype=np.int64)
+    bull_break = np.empty(n, dtype=np.int64)
+    bear_ob = np.empty(n, dtype=np.int64)
+    bear_break = np.empty(n, dtype=np.int64)
+    n_bull = 0
+    n_bear = 0
+    last_high = -1
+    last_low = -1
+    high_crossed = True
+    low_crossed = True
+    for i in range(swing_length, n):
+        check_idx = i - swing_length
+        if is_swing_high[check_idx]:
+            last_high = check_idx
+            high_crossed = False
+        if is_swing_low[check_idx]:
+            last_low = check_idx
+            low_crossed = False
+        current_atr = atr_values[i]
+
+        if last_high >= 0 and not high_crossed and close[i] > high[last_high]:
+            high_crossed = True
+            ob = last_high + np.argmin(low[last_high:i])
+            if (high[ob] - low[ob]) <= current_atr * atr_multiplier or current_atr == 0.0:
+                bull_ob[n_bull] = ob
+                bull_break[n_bull] = i
+                n_bull += 1
+
+        if last_low >= 0 and not low_crossed and close[i] < low[last_low]:
+            low_crossed = True
+            ob = last_low + np.argmax(high[last_low:i])
+            if (high[ob] - low[ob]) <= current_atr * atr_multiplier or current_atr == 0.0:
+                bear_ob[n_bear] = ob
+                bear_break[n_bear] = i
+                n_bear += 1
+
+    bull_ob, bull_break = bull_ob[:n_bull], bull_break[:n_bull]
+    bear_ob, bear_break = bear_ob[:n_bear], bear_break[:n_bear]
+    # 失效判断从突破K线之后开始
+    j_bull = _last_unmitigated(bull_ob, bull_break, low[bull_ob], low, True)
+    j_bear = _last_unmitigated(bear_ob, bear_break, high[bear_ob], high, False)
+    bull_result = (bull_ob[j_bull], bull_break[j_bull]) if j_bull >= 0 else (-1, -1)
+    bear_result = (bear_ob[j_bear], bear_break[j_bear]) if j_bear >= 0 else (-1, -1)
+    return bull_result[0], bull_result[1], bear_result[0], bear_result[1]
+# --- END OF FILE app/analysis/fast_indicators.py ---
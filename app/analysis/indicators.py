@@ -1,26 +1,25 @@
 import math
-import pandas as pd
-from datetime import datetime, timezone
+import numpy as np
+import time
 
 # 本地应用导入
-from app.state import cached_top_symbols
+from app.analysis import fast_indicators
+from app.analysis.levels import find_market_structure_swings
+from app.state import get_symbol_rank_snapshot
 
+# 单轮扫描内的指标缓存: (symbol, timeframe, K线数, 最后一根K线时间戳, 指标, 参数) -> 只读 ndarray / tuple
+# 同一 (symbol, timeframe) 的K线只拉取一次，多个策略也共用同一份 ATR/EMA，每轮扫描结束时清空
+_indicator_cache = {}
 
-def _calculate_dynamic_value(symbol, dyn_conf, fallback_value, config):
+
+def _build_dynamic_value_table(dyn_conf, fallback_value, config, n):
     """
-    一个通用的动态值计算引擎，根据交易对排名计算参数。
+    按排名快照中的币种数 n，一次性向量化算出每个排名对应的动态值，返回长度为 n 的列表 (下标为 rank-1)。
     支持 'linear', 'stepped', 'linear_stepped' 方法。
     - linear/linear_stepped 自动适应当前缓存的币种总数。
     - stepped 依赖于固定的 apply_to_rank_n。
     """
-    if not dyn_conf or not dyn_conf.get('enabled', False):
-        return fallback_value
-
-    try:
-        rank = cached_top_symbols.index(symbol) + 1
-    except (ValueError, TypeError):
-        return dyn_conf.get('default_multiplier') or dyn_conf.get('default_count') or fallback_value
-
+    ranks = np.arange(1, n + 1)
     method = dyn_conf.get('method', 'linear')
 
     min_val_key = 'min_multiplier' if 'min_multiplier' in dyn_conf else 'min_count'
@@ -35,106 +34,159 @@ def _calculate_dynamic_value(symbol, dyn_conf, fallback_value, config):
     if method in ['linear', 'linear_stepped']:
         dynamic_scan_conf = config.get('market_settings', {}).get('dynamic_scan', {})
         dynamic_top_n = dynamic_scan_conf.get('top_n_for_signals', 100)
-        total_ranks_applied = min(len(cached_top_symbols), dynamic_top_n)
-
-        # 如果排名超出了动态计算的范围（例如，是手动添加的白名单币种），则使用默认值
-        if rank > total_ranks_applied:
-            return default_val
+        total_ranks_applied = min(n, dynamic_top_n)
     else:  # stepped
         total_ranks_applied = dyn_conf.get('apply_to_rank_n', 100)
-        if rank > total_ranks_applied:
-            return default_val
-
-    if method == 'linear':
-        if total_ranks_applied <= 1: return min_val
-        slope = (max_val - min_val) / (total_ranks_applied - 1)
-        value = min_val + (rank - 1) * slope
-        if 'count' in min_val_key:
-            return int(round(max(min_val, min(value, max_val))))
-        return max(min_val, min(value, max_val))
-
-    elif method == 'linear_stepped':
-        step_size = dyn_conf.get('rank_step_size', 10)
-        if step_size <= 0: return min_val
-
-        num_steps = math.ceil(total_ranks_applied / step_size)
-        if num_steps <= 1: return min_val
-
-        increment_per_step = (max_val - min_val) / (num_steps - 1)
-        current_step_index = math.floor((rank - 1) / step_size)
-        value = min_val + current_step_index * increment_per_step
-        if 'count' in min_val_key:
-            return int(round(max(min_val, min(value, max_val))))
-        return max(min_val, min(value, max_val))
+
+    if method in ['linear', 'linear_stepped']:
+        if method == 'linear':
+            steps, num_steps = ranks - 1, total_ranks_applied
+        else:
+            step_size = dyn_conf.get('rank_step_size', 10)
+            steps = (ranks - 1) // step_size if step_size > 0 else None
+            num_steps = math.ceil(total_ranks_applied / step_size) if step_size > 0 else 0
+
+        if steps is None or num_steps <= 1:
+            table = [min_val] * n
+        else:
+            values = min_val + steps * ((max_val - min_val) / (num_steps - 1))
+            values = np.maximum(min_val, np.minimum(values, max_val))
+            if 'count' in min_val_key:
+                values = np.round(values).astype(np.int64)
+            table = values.tolist()
 
     elif method == 'stepped':
         tiers = sorted(dyn_conf.get('tiers', []), key=lambda x: x['up_to_rank'])
         # 检查 tiers 是否为空，防止索引错误
-        if not tiers: return default_val
-        tier_val_key = 'multiplier' if 'multiplier' in tiers[0] else 'count'
-        for tier in tiers:
-            if rank <= tier['up_to_rank']:
-                return tier.get(tier_val_key, default_val)
-        return default_val
+        if not tiers:
+            table = [default_val] * n
+        else:
+            tier_val_key = 'multiplier' if 'multiplier' in tiers[0] else 'count'
+            tier_values = [tier.get(tier_val_key, default_val) for tier in tiers] + [default_val]
+            # 每个排名落入的第一个 up_to_rank >= rank 的档位，超出所有档位的取默认值
+            tier_index = np.searchsorted([tier['up_to_rank'] for tier in tiers], ranks, side='left')
+            table = [tier_values[i] for i in tier_index.tolist()]
+
+    else:
+        table = [fallback_value] * n
 
-    return fallback_value
+    # 如果排名超出了动态计算的范围（例如，是手动添加的白名单币种），则使用默认值
+    if total_ranks_applied < n:
+        table[max(total_ranks_applied, 0):] = [default_val] * (n - max(total_ranks_applied, 0))
+    return table
+
+
+def _calculate_dynamic_value(conf_key, symbol, dyn_conf, fallback_value, config):
+    """
+    一个通用的动态值计算引擎，根据交易对排名计算参数。
+    同一轮扫描内对同一配置只建一次查找表，之后每个币种只需按排名取值。
+    """
+    if not dyn_conf or not dyn_conf.get('enabled', False):
+        return fallback_value
+
+    # 只读取一次快照引用：即使此时后台任务正在刷新列表，排名与查找表也来自同一份列表
+    ranks, symbol_count, tables = get_symbol_rank_snapshot()
+    rank = ranks.get(symbol)
+    if rank is None:
+        return dyn_conf.get('default_multiplier') or dyn_conf.get('default_count') or fallback_value
+
+    # 查找表键为 (配置名, fallback)，挂在快照上，列表刷新后自然失效
+    table_key = (conf_key, fallback_value)
+    table = tables.get(table_key)
+    if table is None:
+        table = _build_dynamic_value_table(dyn_conf, fallback_value, config, symbol_count)
+        tables[table_key] = table
+    return table[rank - 1]
 
 
 def get_dynamic_volume_multiplier(symbol, config, fallback_multiplier):
     dyn_conf = config['strategy_params'].get('dynamic_volume_multipliers', {})
-    return _calculate_dynamic_value(symbol, dyn_conf, fallback_multiplier, config)
+    return _calculate_dynamic_value('dynamic_volume_multipliers', symbol, dyn_conf, fallback_multiplier, config)
 
 
 def get_dynamic_atr_multiplier(symbol, config, fallback_multiplier):
     dyn_conf = config['strategy_params'].get('dynamic_atr_multipliers', {})
-    return _calculate_dynamic_value(symbol, dyn_conf, fallback_multiplier, config)
+    return _calculate_dynamic_value('dynamic_atr_multipliers', symbol, dyn_conf, fallback_multiplier, config)
 
 
 def get_dynamic_consecutive_candles(symbol, config, fallback_count):
     dyn_conf = config['strategy_params'].get('consecutive_candles', {}).get('dynamic_count', {})
-    return _calculate_dynamic_value(symbol, dyn_conf, fallback_count, config)
+    return _calculate_dynamic_value('consecutive_candles.dynamic_count', symbol, dyn_conf, fallback_count, config)
 
 
-def is_realtime_volume_over(df, tf_minutes, volume_ma_period, multiplier):
-    df_vol = df.copy()
-    if not isinstance(df.index, pd.DatetimeIndex):
-        df_vol['timestamp'] = pd.to_datetime(df_vol['timestamp'], unit='ms', utc=True)
-    else:
-        # 如果已经是DatetimeIndex，确保它有时区信息
-        if df_vol.index.tz is None:
-            df_vol['timestamp'] = df_vol.index.tz_localize('UTC')
-        else:
-            df_vol['timestamp'] = df_vol.index.tz_convert('UTC')
+def clear_indicator_cache():
+    _indicator_cache.clear()
+
+
+def _get_cached_indicator(symbol, timeframe, df, name, params, compute):
+    key = (symbol, timeframe, len(df), int(df['timestamp'].iat[-1]), name, params)
+    values = _indicator_cache.get(key)
+    if values is None:
+        values = compute()
+        if isinstance(values, np.ndarray):
+            values.flags.writeable = False
+        _indicator_cache[key] = values
+    return values
 
-    if len(df_vol) < volume_ma_period + 1: return False, "", 0.0
 
-    df_vol['volume_ma'] = df_vol['volume'].rolling(window=volume_ma_period).mean().shift(1)
-    df_vol = df_vol.dropna(subset=['volume_ma'])
+def cached_atr(symbol, timeframe, df, length):
+    return _get_cached_indicator(symbol, timeframe, df, 'atr', length, lambda: fast_indicators.atr(
+        df['high'].to_numpy(dtype=np.float64), df['low'].to_numpy(dtype=np.float64),
+        df['close'].to_numpy(dtype=np.float64), length))
 
-    if df_vol.empty: return False, "", 0.0
 
-    current = df_vol.iloc[-1]
-    now_utc = datetime.now(timezone.utc)
-    start_time = current['timestamp']
+def cached_ema(symbol, timeframe, df, length):
+    return _get_cached_indicator(symbol, timeframe, df, 'ema', length, lambda: fast_indicators.ema(
+        df['close'].to_numpy(dtype=np.float64), length))
 
-    # 确保 start_time 也是带时区的
-    if start_time.tzinfo is None:
-        start_time = start_time.replace(tzinfo=timezone.utc)
 
-    minutes_elapsed = (now_utc - start_time).total_seconds() / 60
+def cached_swings(symbol, timeframe, df, left_bars, right_bars):
+    """ 波段前高/前低同样依赖正在形成的K线，因此只在单轮扫描内共享 (多组 level_breakout 配置复用)。 """
+    return _get_cached_indicator(symbol, timeframe, df, 'swings', (left_bars, right_bars),
+                                 lambda: tuple(find_market_structure_swings(df, left_bars, right_bars)))
+
+
+def count_trailing_true(mask):
+    """ 返回布尔数组末尾连续 True 的个数 (用于统计连涨/连跌K线数)。 """
+    if mask.size == 0 or not mask[-1]:
+        return 0
+    reversed_mask = mask[::-1]
+    first_false = int(np.argmin(reversed_mask))
+    return mask.size if reversed_mask[first_false] else first_false
+
+
+def is_realtime_volume_over(df, tf_minutes, volume_ma_period, multiplier):
+    """
+    判断当前K线是否按已走过的时间比例放量。
+    返回 (是否放量, 相对动态基准的倍数, volume_stats)；数据不足时 volume_stats 为 None。
+    volume_stats 只在确实需要展示时才交给 format_volume_text 生成文本。
+    """
+    volume = df['volume'].to_numpy(dtype=np.float64)
+    if volume.size < volume_ma_period + 1: return False, 0.0, None
+
+    # 基准均量为当前K线之前 volume_ma_period 根的平均值 (等价于 rolling().mean().shift(1) 的最后一行)，直接在数组切片上计算
+    current_volume = volume[-1]
+    current_volume_ma = volume[-volume_ma_period - 1:-1].mean()
+    if np.isnan(current_volume_ma): return False, 0.0, None
+
+    # df['timestamp'] 由 OHLCV 加载器统一为 int64 毫秒 (UTC)，直接与当前时间的毫秒数相减
+    minutes_elapsed = (time.time() * 1000 - int(df['timestamp'].iat[-1])) / 60000
     MIN_TIME_RATIO = 0.05
     time_ratio = max(minutes_elapsed / tf_minutes, MIN_TIME_RATIO) if tf_minutes > 0 else 1.0
     time_ratio = min(time_ratio, 1.0)
     actual_time_progress = minutes_elapsed / tf_minutes if tf_minutes > 0 else 1.0
 
-    dynamic_baseline = current['volume_ma'] * time_ratio
-    is_over = current['volume'] > (dynamic_baseline * multiplier)
-    actual_ratio = (current['volume'] / dynamic_baseline) if dynamic_baseline > 0 else float('inf')
+    dynamic_baseline = current_volume_ma * time_ratio
+    is_over = current_volume > (dynamic_baseline * multiplier)
+    actual_ratio = (current_volume / dynamic_baseline) if dynamic_baseline > 0 else float('inf')
+    return is_over, actual_ratio, (current_volume, dynamic_baseline, actual_ratio, actual_time_progress)
+
 
-    text = (
+def format_volume_text(volume_stats, multiplier):
+    current_volume, dynamic_baseline, actual_ratio, actual_time_progress = volume_stats
+    return (
         f"**成交量分析** (周期进行{actual_time_progress:.0%}):\n"
-        f"> **当前量**: {current['volume']:.0f} **(为动态基准的 {actual_ratio:.1f} 倍)**\n"
+        f"> **当前量**: {current_volume:.0f} **(为动态基准的 {actual_ratio:.1f} 倍)**\n"
         f"> **动态基准**: {dynamic_baseline:.0f} (已按时间调整)\n"
         f"> **放量阈值({multiplier:.1f}x)**: {(dynamic_baseline * multiplier):.0f}"
-    )
-    return is_over, text, actual_ratio
\ No newline at end of file
+    )
\ No newline at end of file
@@ -1,5 +1,6 @@
 # --- START OF FILE app/analysis/levels.py ---
-import pandas as pd
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 
 def find_market_structure_swings(df, left_bars=7, right_bars=7):
@@ -10,35 +11,27 @@ def find_market_structure_swings(df, left_bars=7, right_bars=7):
     if len(df) < left_bars + right_bars + 1:
         return []
 
-    df_copy = df.copy()
+    window = left_bars + right_bars + 1
+    half = window // 2  # 与 rolling(center=True) 对齐：窗口起点 + window // 2 即为中心K线
 
-    # 寻找波段高点 (Swing Highs)
-    df_copy['is_swing_high'] = df_copy['high'] == df_copy['high'].rolling(window=left_bars + right_bars + 1,
-                                                                          center=True).max()
+    highs = df['high'].to_numpy(dtype=np.float64)
+    lows = df['low'].to_numpy(dtype=np.float64)
+    timestamps = df['timestamp'].to_numpy()
 
-    # 寻找波段低点 (Swing Lows)
-    df_copy['is_swing_low'] = df_copy['low'] == df_copy['low'].rolling(window=left_bars + right_bars + 1,
-                                                                       center=True).min()
+    # 寻找波段高点 (Swing Highs) / 波段低点 (Swing Lows)：中心K线等于整个窗口的极值，直接在原始数组上比较
+    n_windows = len(highs) - window + 1
+    swing_high_idx = np.flatnonzero(highs[half:half + n_windows] == sliding_window_view(highs, window).max(axis=1)) + half
+    swing_low_idx = np.flatnonzero(lows[half:half + n_windows] == sliding_window_view(lows, window).min(axis=1)) + half
 
     swing_levels = []
 
     # 提取最近的几个波段高点
-    swing_highs = df_copy[df_copy['is_swing_high']].tail(5)
-    for idx, row in swing_highs.iterrows():
-        swing_levels.append({
-            'level': row['high'],
-            'type': '近期前高(Swing High)',
-            'timestamp': row['timestamp']
-        })
+    for i in swing_high_idx[-5:]:
+        swing_levels.append({'level': highs[i], 'type': '近期前高(Swing High)', 'timestamp': timestamps[i]})
 
     # 提取最近的几个波段低点
-    swing_lows = df_copy[df_copy['is_swing_low']].tail(5)
-    for idx, row in swing_lows.iterrows():
-        swing_levels.append({
-            'level': row['low'],
-            'type': '近期前低(Swing Low)',
-            'timestamp': row['timestamp']
-        })
+    for i in swing_low_idx[-5:]:
+        swing_levels.append({'level': lows[i], 'type': '近期前低(Swing Low)', 'timestamp': timestamps[i]})
 
     return swing_levels
 # --- END OF FILE app/analysis/levels.py ---
\ No newline at end of file
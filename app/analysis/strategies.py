@@ -1,22 +1,42 @@
 # --- START OF FILE app/analysis/strategies.py ---
-from datetime import datetime, timezone
+import time
 from loguru import logger
-import pandas as pd
+import numpy as np
 import pandas_ta as pta
 
+from app.analysis import fast_indicators
 from app.analysis.order_blocks import find_lux_order_blocks, find_flux_order_blocks
-from app.state import alerted_states, save_alert_states
+from app.state import alerted_states, set_alert_state
 from app.services.notification_service import send_alert
 from app.services.data_fetcher import fetch_funding_rate
 from app.analysis.trend import get_current_trend, timeframe_to_minutes
-from app.analysis.levels import find_market_structure_swings
 from app.analysis.channels import detect_regression_channel
 from app.analysis.indicators import (
-    get_dynamic_volume_multiplier, get_dynamic_atr_multiplier, is_realtime_volume_over,
-    get_dynamic_consecutive_candles
+    get_dynamic_volume_multiplier, get_dynamic_atr_multiplier, is_realtime_volume_over, format_volume_text,
+    get_dynamic_consecutive_candles, count_trailing_true, cached_atr, cached_ema, cached_swings
 )
+from app.logging_setup import is_debug_enabled
 from app.utils import calculate_cooldown_time
 
+# 预先定义的告警标题/正文模板。{vol_label} 在发送时统一填入 "放量(x) " 或 "缩量(x) "，
+# 其余字段分别来自 signal_info 的 title_data / template_data
+EMA_TITLE_TPL = "🚀 EMA {vol_label}{action}: {symbol} ({timeframe})"
+KDJ_TITLE_TPL = "{emoji} KDJ {vol_label}信号: {signal_type_desc} ({symbol} {timeframe})"
+VOLATILITY_TITLE_TPL = "💥 {vol_label}盘中波动异常: {symbol} ({timeframe})"
+
+LEVEL_BREAKOUT_MSG_TPL = (
+    "{trend_message}**信号**: **{action_desc}！**\n\n**形态学**: 价格突破了 `{original_type}`，{structure_desc}。\n"
+    "> **阻力价位**: `{level:.4f}`\n> **突破价格**: `{current_close:.4f}`\n\n这是典型的右侧看涨信号。\n\n{vol_text}")
+LEVEL_TESTING_RES_MSG_TPL = (
+    "{trend_message}**信号**: **价格正在摸顶/插针试探上方阻力**。\n\n**形态学**: 价格最高点触及了 `{original_type}`。\n"
+    "> **阻力价位**: `{level:.4f}`\n> **当前最高价**: `{current_high:.4f}`\n请留意是否形成受阻回落，或蓄力完成突破。\n\n{vol_text}")
+LEVEL_BREAKDOWN_MSG_TPL = (
+    "{trend_message}**信号**: **{action_desc}！**\n\n**形态学**: 价格跌破了 `{original_type}`，{structure_desc}。\n"
+    "> **支撑价位**: `{level:.4f}`\n> **跌破价格**: `{current_close:.4f}`\n\n这是典型的右侧看跌/破位离场信号。\n\n{vol_text}")
+LEVEL_TESTING_SUP_MSG_TPL = (
+    "{trend_message}**信号**: **价格插针/试探关键支撑**。\n\n**形态学**: 价格最低点触及了 `{original_type}`。\n"
+    "> **支撑价位**: `{level:.4f}`\n> **当前最低价**: `{current_low:.4f}`\n请留意是否企稳反弹，或无力防守破位下行。\n\n{vol_text}")
+
 
 def _get_params_for_timeframe(base_params: dict, timeframe: str) -> dict:
     final_params = base_params.copy()
@@ -27,13 +47,13 @@ def _get_params_for_timeframe(base_params: dict, timeframe: str) -> dict:
 
 
 def _prepare_and_send_notification(config, symbol, timeframe, df, signal_info):
-    now_utc = datetime.now(timezone.utc)
     tf_minutes = timeframe_to_minutes(timeframe)
     params = config['strategy_params']
     market_settings = config.get('market_settings', {})
 
     alert_key = signal_info['alert_key']
-    if alerted_states.get(alert_key) and now_utc < alerted_states[alert_key]:
+    expiry = alerted_states.get(alert_key)
+    if expiry is not None and time.time() < expiry:
         return
 
     vol_text = ""
@@ -59,21 +79,22 @@ def _prepare_and_send_notification(config, symbol, timeframe, df, signal_info):
                 'level_breakout']
             vol_ma_period = raw_lb.get('volume_ma_period', 20)
 
-        is_vol_over, v_text, actual_vol_ratio = is_realtime_volume_over(
+        is_vol_over, actual_vol_ratio, volume_stats = is_realtime_volume_over(
             df, tf_minutes, vol_ma_period, dynamic_multiplier
         )
 
         if final_volume_confirm and not is_vol_over:
-            logger.debug(f"[{symbol}|{timeframe}] 信号 '{signal_info.get('log_name', 'N/A')}' 因成交量不足被过滤。")
+            if is_debug_enabled():
+                logger.debug(f"[{symbol}|{timeframe}] 信号 '{signal_info.get('log_name', 'N/A')}' 因成交量不足被过滤。")
             return
 
         volume_label = f"放量({actual_vol_ratio:.1f}x) " if is_vol_over else f"缩量({actual_vol_ratio:.1f}x) "
-        if v_text and signal_info.get('always_show_volume', True):
-            vol_text = f"\n---\n{v_text}"
+        if volume_stats and signal_info.get('always_show_volume', True):
+            vol_text = f"\n---\n{format_volume_text(volume_stats, dynamic_multiplier)}"
 
-        trend_status, trend_emoji = get_current_trend(df.copy(), timeframe, params)
+        trend_status, trend_emoji = get_current_trend(df, timeframe, params, symbol)
 
-    title = signal_info['title_template'].format(vol_label=volume_label).replace("  ", " ").strip()
+    title = signal_info['title_template'].format(vol_label=volume_label, **signal_info.get('title_data', {}))
 
     message_data = signal_info.get('template_data', {})
     message_data['trend_message'] = f"**当前趋势**: {trend_emoji} {trend_status}\n\n"
@@ -84,12 +105,10 @@ def _prepare_and_send_notification(config, symbol, timeframe, df, signal_info):
     send_alert(config, title, message, symbol)
 
     if signal_info.get('cooldown_logic') == 'align_to_period_end':
-        alerted_states[alert_key] = calculate_cooldown_time(tf_minutes, align_to_period_end=True)
+        set_alert_state(alert_key, calculate_cooldown_time(tf_minutes, align_to_period_end=True))
     else:
         cooldown_minutes = tf_minutes * signal_info.get('cooldown_mult', 1)
-        alerted_states[alert_key] = calculate_cooldown_time(cooldown_minutes)
-
-    save_alert_states()
+        set_alert_state(alert_key, calculate_cooldown_time(cooldown_minutes))
 
 
 def check_level_breakout(exchange, symbol, timeframe, config, df, breakout_params, config_index=0):
@@ -98,31 +117,37 @@ def check_level_breakout(exchange, symbol, timeframe, config, df, breakout_param
     """
     try:
         level_conf = breakout_params.get('level_detection', {})
-        df.ta.atr(length=breakout_params.get('atr_period', 14), append=True)
-        df_cleaned = df.dropna().reset_index(drop=True)
-        if len(df_cleaned) < 3: return
-        current = df_cleaned.iloc[-1]
-        prev = df_cleaned.iloc[-2]
+        atr_period = breakout_params.get('atr_period', 14)
+        atr_values = cached_atr(symbol, timeframe, df, atr_period)
+        # ATR 只在序列开头为 NaN，已形成 ATR 的尾部即为有效K线
+        valid_count = np.count_nonzero(~np.isnan(atr_values))
+        if valid_count < 3: return
+        high, low, close = (df[c].to_numpy(dtype=np.float64)[-valid_count:] for c in ('high', 'low', 'close'))
+        current_close, prev_close = close[-1], close[-2]
+        current_high, current_low = high[-1], low[-1]
+        current_ts = int(df['timestamp'].iat[-1])
         all_levels = []
 
         # 1. 寻找实战波段前高前低
         if level_conf.get('swing_pivots', {}).get('enabled', True):
             left_bars = level_conf.get('swing_pivots', {}).get('left_bars', 7)
             right_bars = level_conf.get('swing_pivots', {}).get('right_bars', 7)
-            swings = find_market_structure_swings(df.copy(), left_bars, right_bars)
+            swings = cached_swings(symbol, timeframe, df, left_bars, right_bars)
             all_levels.extend(swings)
 
         # 2. 寻找近期震荡箱体边界
         if level_conf.get('rolling_pivots', {}).get('enabled', True):
             period = breakout_params.get('breakout_period', 120)
-            if len(df_cleaned) > period:
-                lookback_df = df_cleaned.iloc[-period - 2:-2]
-                if not lookback_df.empty:
-                    all_levels.append({'level': lookback_df['high'].max(), 'type': f'箱体顶部(近{period}根K线)'})
-                    all_levels.append({'level': lookback_df['low'].min(), 'type': f'箱体底部(近{period}根K线)'})
+            if valid_count > period:
+                # 直接在 numpy 切片上求箱体上下沿，避免为两个标量构造子 DataFrame
+                lookback_highs = high[-period - 2:-2]
+                lookback_lows = low[-period - 2:-2]
+                if lookback_highs.size:
+                    all_levels.append({'level': lookback_highs.max(), 'type': f'箱体顶部(近{period}根K线)'})
+                    all_levels.append({'level': lookback_lows.min(), 'type': f'箱体底部(近{period}根K线)'})
 
         if not all_levels: return
-        prev_price = prev['close']
+        prev_price = prev_close
 
         # V=== 核心逻辑修复：强制符合人类视觉习惯 ===V
         # 阻力位：只允许“前高”或“箱体顶部”充当阻力。如果上方出现“前低”，直接无视。
@@ -136,22 +161,22 @@ def check_level_breakout(exchange, symbol, timeframe, config, df, breakout_param
                                'type', '')], key=lambda x: x['level'], reverse=True)
         # ^========================================^
 
-        if resistances or supports:
+        if (resistances or supports) and is_debug_enabled():
             res_str = ", ".join([f"{r['level']:.2f}({r.get('type', 'N/A')})" for r in resistances[:2]])
             sup_str = ", ".join([f"{s['level']:.2f}({s.get('type', 'N/A')})" for s in supports[:2]])
             logger.debug(
-                f"[{symbol}|{timeframe}] 🎯 实战支撑阻力 -> 当前价: {current['close']:.2f} | 阻力: [{res_str}] | 支撑: [{sup_str}]")
+                f"[{symbol}|{timeframe}] 🎯 实战支撑阻力 -> 当前价: {current_close:.2f} | 阻力: [{res_str}] | 支撑: [{sup_str}]")
 
-        atr_val = current.get(f"ATRr_{breakout_params.get('atr_period', 14)}", 0.0)
+        atr_val = atr_values[-1]
         if atr_val == 0: return
         atr_break_buffer = atr_val * breakout_params.get('atr_multiplier_breakout', 0.1)
 
         # --- 阻力位逻辑 (向上突破) ---
         if resistances:
             closest_res = resistances[0]
-            cond_below_res = prev['close'] < closest_res['level']
-            is_breakout = cond_below_res and current['close'] > closest_res['level'] + atr_break_buffer
-            is_testing_res = cond_below_res and current['high'] >= closest_res['level'] and not is_breakout
+            cond_below_res = prev_close < closest_res['level']
+            is_breakout = cond_below_res and current_close > closest_res['level'] + atr_break_buffer
+            is_testing_res = cond_below_res and current_high >= closest_res['level'] and not is_breakout
             original_type = closest_res.get('type', '阻力位')
 
             if original_type == '近期前高(Swing High)':
@@ -162,32 +187,35 @@ def check_level_breakout(exchange, symbol, timeframe, config, df, breakout_param
             if is_breakout:
                 signal_info = {
                     'log_name': 'Level Breakout BOS',
-                    'alert_key': f"{symbol}_{timeframe}_BOS_UP_{config_index}_{current['timestamp']}",
+                    'alert_key': f"{symbol}_{timeframe}_BOS_UP_{config_index}_{current_ts}",
                     'volume_must_confirm': breakout_params.get('volume_confirm', True),
                     'fallback_multiplier': breakout_params.get('volume_multiplier', 1.5),
                     'title_template': signal_title,
-                    'message_template': (
-                            "{trend_message}**信号**: **" + action_desc + "！**\n\n**形态学**: 价格突破了 `{original_type}`，{structure_desc}。\n> **阻力价位**: `{closest_res['level']:.4f}`\n> **突破价格**: `{current['close']:.4f}`\n\n这是典型的右侧看涨信号。\n\n{vol_text}"),
-                    'template_data': {}, 'cooldown_mult': 1
+                    'message_template': LEVEL_BREAKOUT_MSG_TPL,
+                    'template_data': {"action_desc": action_desc, "original_type": original_type,
+                                      "structure_desc": structure_desc, "level": closest_res['level'],
+                                      "current_close": current_close},
+                    'cooldown_mult': 1
                 }
                 _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
             elif is_testing_res:
                 signal_info = {
                     'log_name': 'Level Testing Res',
-                    'alert_key': f"{symbol}_{timeframe}_testing_res_{config_index}_{current['timestamp']}",
+                    'alert_key': f"{symbol}_{timeframe}_testing_res_{config_index}_{current_ts}",
                     'volume_must_confirm': False, 'title_template': test_title,
-                    'message_template': (
-                        "{trend_message}**信号**: **价格正在摸顶/插针试探上方阻力**。\n\n**形态学**: 价格最高点触及了 `{original_type}`。\n> **阻力价位**: `{closest_res['level']:.4f}`\n> **当前最高价**: `{current['high']:.4f}`\n请留意是否形成受阻回落，或蓄力完成突破。\n\n{vol_text}"),
-                    'template_data': {}, 'cooldown_mult': 1, 'always_show_volume': True
+                    'message_template': LEVEL_TESTING_RES_MSG_TPL,
+                    'template_data': {"original_type": original_type, "level": closest_res['level'],
+                                      "current_high": current_high},
+                    'cooldown_mult': 1, 'always_show_volume': True
                 }
                 _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
 
         # --- 支撑位逻辑 (向下砸穿) ---
         if supports:
             closest_sup = supports[0]
-            cond_above_sup = prev['close'] > closest_sup['level']
-            is_breakdown = cond_above_sup and current['close'] < closest_sup['level'] - atr_break_buffer
-            is_testing_sup = cond_above_sup and current['low'] <= closest_sup['level'] and not is_breakdown
+            cond_above_sup = prev_close > closest_sup['level']
+            is_breakdown = cond_above_sup and current_close < closest_sup['level'] - atr_break_buffer
+            is_testing_sup = cond_above_sup and current_low <= closest_sup['level'] and not is_breakdown
             original_type = closest_sup.get('type', '支撑位')
 
             if original_type == '近期前低(Swing Low)':
@@ -198,27 +226,31 @@ def check_level_breakout(exchange, symbol, timeframe, config, df, breakout_param
             if is_breakdown:
                 signal_info = {
                     'log_name': 'Level Breakdown BOS',
-                    'alert_key': f"{symbol}_{timeframe}_BOS_DOWN_{config_index}_{current['timestamp']}",
+                    'alert_key': f"{symbol}_{timeframe}_BOS_DOWN_{config_index}_{current_ts}",
                     'volume_must_confirm': breakout_params.get('volume_confirm', True),
                     'fallback_multiplier': breakout_params.get('volume_multiplier', 1.5),
                     'title_template': signal_title,
-                    'message_template': (
-                            "{trend_message}**信号**: **" + action_desc + "！**\n\n**形态学**: 价格跌破了 `{original_type}`，{structure_desc}。\n> **支撑价位**: `{closest_sup['level']:.4f}`\n> **跌破价格**: `{current['close']:.4f}`\n\n这是典型的右侧看跌/破位离场信号。\n\n{vol_text}"),
-                    'template_data': {}, 'cooldown_mult': 1
+                    'message_template': LEVEL_BREAKDOWN_MSG_TPL,
+                    'template_data': {"action_desc": action_desc, "original_type": original_type,
+                                      "structure_desc": structure_desc, "level": closest_sup['level'],
+                                      "current_close": current_close},
+                    'cooldown_mult': 1
                 }
                 _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
             elif is_testing_sup:
                 signal_info = {
                     'log_name': 'Level Testing Sup',
-                    'alert_key': f"{symbol}_{timeframe}_testing_sup_{config_index}_{current['timestamp']}",
+                    'alert_key': f"{symbol}_{timeframe}_testing_sup_{config_index}_{current_ts}",
                     'volume_must_confirm': False, 'title_template': test_title,
-                    'message_template': (
-                        "{trend_message}**信号**: **价格插针/试探关键支撑**。\n\n**形态学**: 价格最低点触及了 `{original_type}`。\n> **支撑价位**: `{closest_sup['level']:.4f}`\n> **当前最低价**: `{current['low']:.4f}`\n请留意是否企稳反弹，或无力防守破位下行。\n\n{vol_text}"),
-                    'template_data': {}, 'cooldown_mult': 1, 'always_show_volume': True
+                    'message_template': LEVEL_TESTING_SUP_MSG_TPL,
+                    'template_data': {"original_type": original_type, "level": closest_sup['level'],
+                                      "current_low": current_low},
+                    'cooldown_mult': 1, 'always_show_volume': True
                 }
                 _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
     except Exception as e:
-        logger.error(f"❌ 在 {symbol} {timeframe} (关键位突破) 中出错: {e}", exc_info=True)
+        # 完整堆栈只在 DEBUG 级别输出，限流风暴时避免每个错误都格式化 traceback
+        logger.opt(exception=is_debug_enabled()).error(f"❌ 在 {symbol} {timeframe} (关键位突破) 中出错: {e}")
 
 
 def _check_ob_base(exchange, symbol, timeframe, config, df, ob_params, config_index, algo_name, bull_ob, bear_ob,
@@ -229,88 +261,94 @@ def _check_ob_base(exchange, symbol, timeframe, config, df, ob_params, config_in
     try:
         all_obs = [ob for ob in [bear_ob, bull_ob] if ob]
         if not all_obs: return
-        current, prev = df.iloc[-1], df.iloc[-2]
+        close = df['close'].to_numpy(dtype=np.float64)
+        current_close, prev_close = close[-1], close[-2]
 
-        ob_logs = [f"{'熊市OB' if ob['type'] == 'bearish' else '牛市OB'}: [{ob['bottom']:.4f}-{ob['top']:.4f}]" for ob
-                   in all_obs]
-        logger.debug(f"[{symbol}|{timeframe}] 🧱 {algo_name} 计算完毕 -> {', '.join(ob_logs)}")
+        if is_debug_enabled():
+            ob_logs = [f"{'熊市OB' if ob['type'] == 'bearish' else '牛市OB'}: [{ob['bottom']:.4f}-{ob['top']:.4f}]"
+                       for ob in all_obs]
+            logger.debug(f"[{symbol}|{timeframe}] 🧱 {algo_name} 计算完毕 -> {', '.join(ob_logs)}")
 
         for ob in all_obs:
             top, bottom = ob['top'], ob['bottom']
 
-            if prev['close'] < bottom:  # OB 在价格上方，充当【阻力】
+            if prev_close < bottom:  # OB 在价格上方，充当【阻力】
                 if ob['type'] == 'bearish':
                     ob_name, action_test, action_break = f"熊市订单块 ({algo_name} 供应区)", "向上触及上方的", "强势突破了上方的"
                 else:
                     ob_name, action_test, action_break = f"看跌转换块 ({algo_name} 阻力转换区)", "反抽测试前期跌破的", "向上强势收复了前期跌破的"
 
-                if ob_params.get('alert_on_rejection', True) and bottom <= current['close'] <= top:
+                if ob_params.get('alert_on_rejection', True) and bottom <= current_close <= top:
                     signal_info = {
                         'log_name': f'OB Testing Res ({algo_prefix})',
                         'alert_key': f"{symbol}_{timeframe}_OB_TEST_RES_{algo_prefix}_{ob['timestamp']}",
                         'volume_must_confirm': False, 'title_template': f"⚠️ {symbol} ({timeframe}) 测试关键阻力区",
                         'message_template': (
-                                "{trend_message}**信号**: 价格**" + action_test + "** " + ob_name + "。\n\n> **阻力区间**: `{bottom:.4f} - {top:.4f}`\n> **当前价格**: `{current_close:.4f}`\n\n请关注此处是否受阻回落，或蓄力突破。\n\n{vol_text}"),
-                        'template_data': {"bottom": bottom, "top": top, "current_close": current['close']},
+                                "{trend_message}**信号**: 价格**{action}** {ob_name}。\n\n> **阻力区间**: `{bottom:.4f} - {top:.4f}`\n> **当前价格**: `{current_close:.4f}`\n\n请关注此处是否受阻回落，或蓄力突破。\n\n{vol_text}"),
+                        'template_data': {"bottom": bottom, "top": top, "current_close": current_close,
+                                          "action": action_test, "ob_name": ob_name},
                         'cooldown_mult': 2, 'always_show_volume': True
                     }
                     _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
 
-                elif ob_params.get('alert_on_breakout', False) and current['close'] > top:
+                elif ob_params.get('alert_on_breakout', False) and current_close > top:
                     signal_info = {
                         'log_name': f'OB Breakout Up ({algo_prefix})',
                         'alert_key': f"{symbol}_{timeframe}_OB_BREAK_UP_{algo_prefix}_{ob['timestamp']}",
                         'volume_must_confirm': True, 'fallback_multiplier': 1.8,
                         'title_template': f"🚀 {{vol_label}}强势突破阻力区: {symbol} ({timeframe})",
                         'message_template': (
-                                "{trend_message}**信号**: 价格已**" + action_break + "** " + ob_name + "！\n\n> **原阻力区间**: `{bottom:.4f} - {top:.4f}`\n> **突破价格**: `{current_close:.4f}`\n\n阻力现已转化为支撑，多头结构确认。\n\n{vol_text}"),
-                        'template_data': {"bottom": bottom, "top": top, "current_close": current['close']},
+                                "{trend_message}**信号**: 价格已**{action}** {ob_name}！\n\n> **原阻力区间**: `{bottom:.4f} - {top:.4f}`\n> **突破价格**: `{current_close:.4f}`\n\n阻力现已转化为支撑，多头结构确认。\n\n{vol_text}"),
+                        'template_data': {"bottom": bottom, "top": top, "current_close": current_close,
+                                          "action": action_break, "ob_name": ob_name},
                         'cooldown_mult': 4
                     }
                     _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
 
-            elif prev['close'] > top:  # OB 在价格下方，充当【支撑】
+            elif prev_close > top:  # OB 在价格下方，充当【支撑】
                 if ob['type'] == 'bullish':
                     ob_name, action_test, action_break = f"牛市订单块 ({algo_name} 需求区)", "向下回踩下方的", "有效跌破了下方的"
                 else:
                     ob_name, action_test, action_break = f"看涨转换块 ({algo_name} 支撑转换区)", "向下回踩前期突破的", "向下砸穿了前期突破的"
 
-                if ob_params.get('alert_on_rejection', True) and bottom <= current['close'] <= top:
+                if ob_params.get('alert_on_rejection', True) and bottom <= current_close <= top:
                     signal_info = {
                         'log_name': f'OB Testing Sup ({algo_prefix})',
                         'alert_key': f"{symbol}_{timeframe}_OB_TEST_SUP_{algo_prefix}_{ob['timestamp']}",
                         'volume_must_confirm': False, 'title_template': f"💡 {symbol} ({timeframe}) 测试关键支撑区",
                         'message_template': (
-                                "{trend_message}**信号**: 价格**" + action_test + "** " + ob_name + "。\n\n> **支撑区间**: `{bottom:.4f} - {top:.4f}`\n> **当前价格**: `{current_close:.4f}`\n\n请关注此处是否获得支撑企稳，或无力跌破。\n\n{vol_text}"),
-                        'template_data': {"bottom": bottom, "top": top, "current_close": current['close']},
+                                "{trend_message}**信号**: 价格**{action}** {ob_name}。\n\n> **支撑区间**: `{bottom:.4f} - {top:.4f}`\n> **当前价格**: `{current_close:.4f}`\n\n请关注此处是否获得支撑企稳，或无力跌破。\n\n{vol_text}"),
+                        'template_data': {"bottom": bottom, "top": top, "current_close": current_close,
+                                          "action": action_test, "ob_name": ob_name},
                         'cooldown_mult': 2, 'always_show_volume': True
                     }
                     _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
 
-                elif ob_params.get('alert_on_breakout', False) and current['close'] < bottom:
+                elif ob_params.get('alert_on_breakout', False) and current_close < bottom:
                     signal_info = {
                         'log_name': f'OB Breakout Down ({algo_prefix})',
                         'alert_key': f"{symbol}_{timeframe}_OB_BREAK_DOWN_{algo_prefix}_{ob['timestamp']}",
                         'volume_must_confirm': True, 'fallback_multiplier': 1.8,
                         'title_template': f"📉 {{vol_label}}有效跌破支撑区: {symbol} ({timeframe})",
                         'message_template': (
-                                "{trend_message}**信号**: 价格已**" + action_break + "** " + ob_name + "！\n\n> **原支撑区间**: `{bottom:.4f} - {top:.4f}`\n> **跌破价格**: `{current_close:.4f}`\n\n支撑现已转化为强阻力，空头结构确认。\n\n{vol_text}"),
-                        'template_data': {"bottom": bottom, "top": top, "current_close": current['close']},
+                                "{trend_message}**信号**: 价格已**{action}** {ob_name}！\n\n> **原支撑区间**: `{bottom:.4f} - {top:.4f}`\n> **跌破价格**: `{current_close:.4f}`\n\n支撑现已转化为强阻力，空头结构确认。\n\n{vol_text}"),
+                        'template_data': {"bottom": bottom, "top": top, "current_close": current_close,
+                                          "action": action_break, "ob_name": ob_name},
                         'cooldown_mult': 4
                     }
                     _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
     except Exception as e:
-        logger.error(f"❌ OB判断出错: {e}", exc_info=True)
+        logger.opt(exception=is_debug_enabled()).error(f"❌ OB判断出错: {e}")
 
 
 def check_ob_luxalgo(exchange, symbol, timeframe, config, df, ob_params, config_index=0):
-    bull_ob, bear_ob = find_lux_order_blocks(df.copy(), ob_params.get('swing_length', 5))
+    bull_ob, bear_ob = find_lux_order_blocks(df, ob_params.get('swing_length', 5))
     _check_ob_base(exchange, symbol, timeframe, config, df, ob_params, config_index, "爆量OB(Lux)", bull_ob, bear_ob,
                    "LUX")
 
 
 def check_ob_fluxcharts(exchange, symbol, timeframe, config, df, ob_params, config_index=0):
-    bull_ob, bear_ob = find_flux_order_blocks(df.copy(), ob_params.get('swing_length', 10),
+    bull_ob, bear_ob = find_flux_order_blocks(df, ob_params.get('swing_length', 10),
                                               ob_params.get('atr_multiplier', 3.5))
     _check_ob_base(exchange, symbol, timeframe, config, df, ob_params, config_index, "结构OB(Flux)", bull_ob, bear_ob,
                    "FLUX")
@@ -321,31 +359,35 @@ def check_ma_breakout(exchange, symbol, timeframe, config, df, ma_params, config
     try:
         ma_periods = ma_params.get('ma_periods', [7, 25, 99])
         ma_type = ma_params.get('ma_type', 'sma').lower()
+        close = df['close'].to_numpy(dtype=np.float64)
+        ma_values = {}
         for period in ma_periods:
-            col_name = f"{ma_type}_{period}"
             if ma_type == 'ema':
-                df[col_name] = pta.ema(df['close'], length=period)
+                ma_values[period] = cached_ema(symbol, timeframe, df, period)
             else:
-                df[col_name] = pta.sma(df['close'], length=period)
-        df_cleaned = df.dropna().reset_index(drop=True)
-        if len(df_cleaned) < 2: return
-        current, prev = df_cleaned.iloc[-1], df_cleaned.iloc[-2]
-
-        ma_log_list = []
-        for period in ma_periods:
-            col_name = f"{ma_type}_{period}"
-            if col_name in current: ma_log_list.append(f"{ma_type.upper()}{period}: {current[col_name]:.4f}")
-        if ma_log_list: logger.debug(
-            f"[{symbol}|{timeframe}] 📈 均线计算完毕 -> 当前价: {current['close']:.4f} | 均线: {', '.join(ma_log_list)}")
+                sma = pta.sma(df['close'], length=period)
+                if sma is None: return
+                ma_values[period] = sma.to_numpy(dtype=np.float64)
+        # 只在所有均线都已形成的K线上比较
+        valid_mask = np.ones(close.size, dtype=bool)
+        for values in ma_values.values():
+            valid_mask &= ~np.isnan(values)
+        valid = np.flatnonzero(valid_mask)
+        if valid.size < 2: return
+        cur, prv = valid[-1], valid[-2]
+        current_close, prev_close = close[cur], close[prv]
+
+        if ma_values and is_debug_enabled():
+            ma_log_list = [f"{ma_type.upper()}{period}: {values[cur]:.4f}" for period, values in ma_values.items()]
+            logger.debug(
+                f"[{symbol}|{timeframe}] 📈 均线计算完毕 -> 当前价: {current_close:.4f} | 均线: {', '.join(ma_log_list)}")
 
-        for period in ma_periods:
-            col_name = f"{ma_type}_{period}"
-            if col_name not in current: continue
-            ma_val = current[col_name]
-            prev_ma_val = prev[col_name]
+        for period, values in ma_values.items():
+            ma_val = values[cur]
+            prev_ma_val = values[prv]
 
-            bullish = prev['close'] < prev_ma_val and current['close'] > ma_val
-            bearish = prev['close'] > prev_ma_val and current['close'] < ma_val
+            bullish = prev_close < prev_ma_val and current_close > ma_val
+            bearish = prev_close > prev_ma_val and current_close < ma_val
 
             if bullish or bearish:
                 action, emoji = ("突破", "🚀") if bullish else ("跌破", "📉")
@@ -358,7 +400,7 @@ def check_ma_breakout(exchange, symbol, timeframe, config, df, ma_params, config
                     'message_template': (
                         "{trend_message}**信号**: 价格实时 **{action}** {ma_type.upper()}({period}) 均线。\n\n> **当前价**: `{current_close:.4f}`\n> **均线值**: `{ma_value:.4f}`\n\n{vol_text}"),
                     'template_data': {"action": action, "period": period, "ma_type": ma_type.upper(),
-                                      "current_close": current['close'], "ma_value": ma_val},
+                                      "current_close": current_close, "ma_value": ma_val},
                     'cooldown_mult': 1
                 }
                 _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
@@ -370,33 +412,34 @@ def check_ema_signals(exchange, symbol, timeframe, config, df, ema_params, confi
     try:
         atr_period = ema_params.get('atr_period', 14)
         atr_multiplier = ema_params.get('atr_multiplier', 0.3)
-        df.ta.atr(length=atr_period, append=True)
         ema_period = ema_params.get('period', 120)
-        indicator_result = df.ta.ema(length=ema_period, append=True)
-        if indicator_result is None or indicator_result.empty: return
-        ema_col = indicator_result.columns[0] if isinstance(indicator_result, pd.DataFrame) else indicator_result.name
-        df_cleaned = df.dropna(subset=[ema_col]).reset_index(drop=True)
-        if len(df_cleaned) < 2: return
-        current, prev = df_cleaned.iloc[-1], df_cleaned.iloc[-2]
-        atr_col = f"ATRr_{atr_period}"
-        if pd.isna(current.get(atr_col)) or current.get(atr_col, 0) == 0: return
-        atr_val = current[atr_col]
+        high, low, close = (df[c].to_numpy(dtype=np.float64) for c in ('high', 'low', 'close'))
+        ema_values = cached_ema(symbol, timeframe, df, ema_period)
+        atr_values = cached_atr(symbol, timeframe, df, atr_period)
+        valid = np.flatnonzero(~np.isnan(ema_values))
+        if valid.size < 2: return
+        cur, prv = valid[-1], valid[-2]
+        atr_val = atr_values[cur]
+        if np.isnan(atr_val) or atr_val == 0: return
+        current_close, prev_close, prev_low = close[cur], close[prv], low[prv]
+        current_ema, prev_ema = ema_values[cur], ema_values[prv]
         atr_buffer = atr_val * atr_multiplier
-        bullish = (current['close'] > current[ema_col] + atr_buffer) and (prev['close'] < prev[ema_col])
-        bearish = (current['close'] < current[ema_col] - atr_buffer) and (prev['low'] > prev[ema_col])
+        bullish = (current_close > current_ema + atr_buffer) and (prev_close < prev_ema)
+        bearish = (current_close < current_ema - atr_buffer) and (prev_low > prev_ema)
         if bullish or bearish:
             action = "有效突破" if bullish else "有效跌破"
-            breakout_distance = abs(current['close'] - current[ema_col])
+            breakout_distance = abs(current_close - current_ema)
             breakout_atr_ratio = (breakout_distance / atr_val) if atr_val > 0 else float('inf')
             signal_info = {
                 'log_name': 'EMA Cross', 'alert_key': f"{symbol}_{timeframe}_EMACROSS_{config_index}",
                 'volume_must_confirm': ema_params.get('volume_confirm', False),
                 'fallback_multiplier': ema_params.get('volume_multiplier', 1.5),
-                'title_template': f"🚀 EMA {{vol_label}}{action}: {symbol} ({timeframe})",
+                'title_template': EMA_TITLE_TPL,
+                'title_data': {"action": action, "symbol": symbol, "timeframe": timeframe},
                 'message_template': (
                     "{trend_message}**信号**: 价格 **实时{action}** EMA({period})。\n\n> **当前价**: {current_close:.4f}\n> **EMA值**: {ema_value:.4f}\n> **突破力度**: **{breakout_atr_ratio:.1f} 倍 ATR**\n\n{vol_text}"),
-                'template_data': {"action": action, "period": ema_period, "current_close": current['close'],
-                                  "ema_value": current[ema_col], "breakout_atr_ratio": breakout_atr_ratio},
+                'template_data': {"action": action, "period": ema_period, "current_close": current_close,
+                                  "ema_value": current_ema, "breakout_atr_ratio": breakout_atr_ratio},
                 'cooldown_mult': 1
             }
             _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
@@ -406,17 +449,17 @@ def check_ema_signals(exchange, symbol, timeframe, config, df, ema_params, confi
 
 def check_kdj_cross(exchange, symbol, timeframe, config, df, kdj_params, config_index=0):
     try:
-        indicator_result = df.ta.kdj(fast=kdj_params.get('fast_k', 9), slow=kdj_params.get('slow_k', 3),
-                                     signal=kdj_params.get('slow_d', 3), append=True)
-        if indicator_result is None or indicator_result.empty: return
-        k_col, d_col = indicator_result.columns[0], indicator_result.columns[1]
-        df_cleaned = df.dropna(subset=[k_col, d_col]).reset_index(drop=True)
-        if len(df_cleaned) < 2: return
-        current, prev = df_cleaned.iloc[-1], df_cleaned.iloc[-2]
-        golden = current[k_col] > current[d_col] and prev[k_col] <= prev[d_col]
-        death = current[k_col] < current[d_col] and prev[k_col] >= prev[d_col]
+        high, low, close = (df[c].to_numpy(dtype=np.float64) for c in ('high', 'low', 'close'))
+        k_values, d_values = fast_indicators.kdj(high, low, close, kdj_params.get('fast_k', 9),
+                                                 kdj_params.get('slow_d', 3))
+        valid = np.flatnonzero(~(np.isnan(k_values) | np.isnan(d_values)))
+        if valid.size < 2: return
+        cur, prv = valid[-1], valid[-2]
+        current_k, current_d, prev_k, prev_d = k_values[cur], d_values[cur], k_values[prv], d_values[prv]
+        golden = current_k > current_d and prev_k <= prev_d
+        death = current_k < current_d and prev_k >= prev_d
         if not (golden or death): return
-        trend_status, trend_emoji = get_current_trend(df.copy(), timeframe, config['strategy_params'])
+        trend_status, trend_emoji = get_current_trend(df, timeframe, config['strategy_params'], symbol)
         signal_type_desc = ""
         if "多头" in trend_status:
             signal_type_desc = "顺势看涨 (入场机会)" if golden else "回调警示 (减仓风险)"
@@ -431,11 +474,13 @@ def check_kdj_cross(exchange, symbol, timeframe, config, df, kdj_params, config_
             'log_name': 'KDJ Cross', 'alert_key': f"{symbol}_{timeframe}_KDJ_{config_index}",
             'volume_must_confirm': kdj_params.get('volume_confirm', True),
             'fallback_multiplier': kdj_params.get('volume_multiplier', 1.5),
-            'title_template': f"{emoji} KDJ {{vol_label}}信号: {signal_type_desc} ({symbol} {timeframe})",
+            'title_template': KDJ_TITLE_TPL,
+            'title_data': {"emoji": emoji, "signal_type_desc": signal_type_desc, "symbol": symbol,
+                           "timeframe": timeframe},
             'message_template': (
                 "{trend_message}**信号解读**: {signal_type_desc}信号出现。\n\n**当前K/D值**: {k_val:.2f} / {d_val:.2f}\n**当前价**: {price:.4f}\n\n{vol_text}"),
-            'template_data': {"signal_type_desc": signal_type_desc, "k_val": current[k_col], "d_val": current[d_col],
-                              "price": current['close']},
+            'template_data': {"signal_type_desc": signal_type_desc, "k_val": current_k, "d_val": current_d,
+                              "price": close[cur]},
             'cooldown_mult': 0.5
         }
         _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
@@ -447,22 +492,22 @@ def check_volatility_breakout(exchange, symbol, timeframe, config, df, vol_param
     try:
         atr_period = vol_params.get('atr_period', 14)
         dynamic_atr_multiplier = get_dynamic_atr_multiplier(symbol, config, vol_params.get('atr_multiplier', 2.5))
-        df.ta.atr(length=atr_period, append=True)
-        atr_col = f"ATRr_{atr_period}"
-        if atr_col not in df.columns: return
-        df_cleaned = df.dropna(subset=[atr_col]).reset_index(drop=True)
-        if len(df_cleaned) < 2: return
-        current, prev = df_cleaned.iloc[-1], df_cleaned.iloc[-2]
-        if pd.isna(prev.get(atr_col)) or prev.get(atr_col, 0) == 0: return
-        current_volatility = current['high'] - current['low']
-        reference_atr = prev[atr_col]
+        high, low, close = (df[c].to_numpy(dtype=np.float64) for c in ('high', 'low', 'close'))
+        atr_values = cached_atr(symbol, timeframe, df, atr_period)
+        valid = np.flatnonzero(~np.isnan(atr_values))
+        if valid.size < 2: return
+        cur, prv = valid[-1], valid[-2]
+        reference_atr = atr_values[prv]
+        if reference_atr == 0: return
+        current_volatility = high[cur] - low[cur]
         if current_volatility > reference_atr * dynamic_atr_multiplier:
             actual_atr_ratio = current_volatility / reference_atr
             signal_info = {
                 'log_name': 'Volatility Breakout', 'alert_key': f"{symbol}_{timeframe}_VOLATILITY_{config_index}",
                 'volume_must_confirm': vol_params.get('volume_confirm', True),
                 'fallback_multiplier': vol_params.get('volume_multiplier', 2.0),
-                'title_template': f"💥 {{vol_label}}盘中波动异常: {symbol} ({timeframe})",
+                'title_template': VOLATILITY_TITLE_TPL,
+                'title_data': {"symbol": symbol, "timeframe": timeframe},
                 'message_template': (
                     "{trend_message}**波动分析**:\n> **当前波幅**: `{current_volatility:.4f}` **({actual_atr_ratio:.1f}倍)**\n> **参考ATR**: `{reference_atr:.4f}`\n\n{vol_text}"),
                 'template_data': {"current_volatility": current_volatility, "actual_atr_ratio": actual_atr_ratio,
@@ -476,20 +521,22 @@ def check_volatility_breakout(exchange, symbol, timeframe, config, df, vol_param
 
 def check_rsi_divergence(exchange, symbol, timeframe, config, df, rsi_params, config_index=0):
     try:
-        indicator_result = pta.rsi(df['close'], length=rsi_params.get('rsi_period', 14))
-        if indicator_result is None or indicator_result.empty: return
-        df['rsi'] = indicator_result
-        df_cleaned = df.dropna(subset=['rsi']).reset_index(drop=True)
+        close = df['close'].to_numpy(dtype=np.float64)
+        rsi_values = fast_indicators.rsi(close, rsi_params.get('rsi_period', 14))
+        # 只保留 RSI 已形成的K线 (等价于 dropna)，直接在数组切片上比较
+        valid = np.flatnonzero(~np.isnan(rsi_values))
         lookback = rsi_params.get('lookback_period', 60)
-        if len(df_cleaned) < lookback + 1: return
-        recent_df, current = df_cleaned.iloc[-lookback - 1:-1], df_cleaned.iloc[-1]
-        if current['close'] > recent_df['close'].max() and current['rsi'] < recent_df['rsi'].max():
+        if len(valid) < lookback + 1: return
+        close, rsi_values = close[valid], rsi_values[valid]
+        recent_close, recent_rsi = close[-lookback - 1:-1], rsi_values[-lookback - 1:-1]
+        current_close, current_rsi = close[-1], rsi_values[-1]
+        if current_close > recent_close.max() and current_rsi < recent_rsi.max():
             signal_info = {'log_name': 'RSI Top Div', 'alert_key': f"{symbol}_{timeframe}_DIV_TOP_{config_index}",
                            'volume_must_confirm': False, 'title_template': f"🚩 RSI顶背离风险: {symbol} ({timeframe})",
                            'message_template': "{trend_message}**信号**: 价格创近期新高，但RSI指标衰弱。\n\n{vol_text}",
                            'template_data': {}, 'cooldown_mult': 2, 'always_show_volume': True}
             _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
-        if current['close'] < recent_df['close'].min() and current['rsi'] > recent_df['rsi'].min():
+        if current_close < recent_close.min() and current_rsi > recent_rsi.min():
             signal_info = {'log_name': 'RSI Bottom Div', 'alert_key': f"{symbol}_{timeframe}_DIV_BOT_{config_index}",
                            'volume_must_confirm': False, 'title_template': f"⛳️ RSI底背离机会: {symbol} ({timeframe})",
                            'message_template': "{trend_message}**信号**: 价格创近期新低，但RSI指标企稳。\n\n{vol_text}",
@@ -502,9 +549,8 @@ def check_rsi_divergence(exchange, symbol, timeframe, config, df, rsi_params, co
 def check_trend_channel_breakout(exchange, symbol, timeframe, config, df, channel_params, config_index=0):
     try:
         if 'lookback_period' not in channel_params: return
-        df.ta.atr(length=14, append=True)
-        atr_col = "ATRr_14"
-        if atr_col not in df.columns: return
+        atr_values = cached_atr(symbol, timeframe, df, 14)
+        if np.isnan(atr_values).all(): return
 
         df_for_channel = df.copy()
         df_for_channel['symbol'] = symbol
@@ -514,29 +560,30 @@ def check_trend_channel_breakout(exchange, symbol, timeframe, config, df, channe
                                                  std_dev_multiplier=channel_params.get('std_dev_multiplier', 2.0))
 
         if not channel_info or len(df) < 3: return
-        current, prev = df.iloc[-1], df.iloc[-2]
-        current_upper_band = channel_info['upper_band'].iloc[-1]
-        prev_upper_band = channel_info['upper_band'].iloc[-2]
-        current_lower_band = channel_info['lower_band'].iloc[-1]
-        prev_lower_band = channel_info['lower_band'].iloc[-2]
-        confirmation_buffer = current.get(atr_col, 0) * channel_params.get('breakout_confirmation_atr', 0.0)
-
-        trend_dir = "↘️下降趋势" if channel_info['slope'] < 0 else "↗️上升趋势"
-        logger.debug(
-            f"[{symbol}|{timeframe}] 🛤️ 通道计算完毕 -> {trend_dir} (已持续 {channel_info['trend_length']} 根K线) | 当前价: {current['close']:.2f} | 通道上轨: {current_upper_band:.2f} | 通道下轨: {current_lower_band:.2f}")
+        close = df['close'].to_numpy(dtype=np.float64)
+        current_close, prev_close = close[-1], close[-2]
+        upper_band, lower_band = channel_info['upper_band'].to_numpy(), channel_info['lower_band'].to_numpy()
+        current_upper_band, prev_upper_band = upper_band[-1], upper_band[-2]
+        current_lower_band, prev_lower_band = lower_band[-1], lower_band[-2]
+        confirmation_buffer = atr_values[-1] * channel_params.get('breakout_confirmation_atr', 0.0)
+
+        if is_debug_enabled():
+            trend_dir = "↘️下降趋势" if channel_info['slope'] < 0 else "↗️上升趋势"
+            logger.debug(
+                f"[{symbol}|{timeframe}] 🛤️ 通道计算完毕 -> {trend_dir} (已持续 {channel_info['trend_length']} 根K线) | 当前价: {current_close:.2f} | 通道上轨: {current_upper_band:.2f} | 通道下轨: {current_lower_band:.2f}")
 
         if channel_info['slope'] < 0:
-            if prev['close'] < prev_upper_band and current['close'] > current_upper_band + confirmation_buffer:
+            if prev_close < prev_upper_band and current_close > current_upper_band + confirmation_buffer:
                 signal_info = {'log_name': f"Channel Up", 'alert_key': f"{symbol}_{timeframe}_CHAN_UP_{config_index}",
                                'volume_must_confirm': channel_params.get('volume_confirm', True),
                                'fallback_multiplier': channel_params.get('volume_multiplier', 1.8),
                                'title_template': f"📈 {{vol_label}}突破回归通道: {symbol} ({timeframe})",
                                'message_template': (
                                    "{trend_message}**信号**: **确认突破下降回归通道**。\n\n> **突破价格**: `{current_close:.4f}`\n\n{vol_text}"),
-                               'template_data': {"current_close": current['close']}, 'cooldown_mult': 4}
+                               'template_data': {"current_close": current_close}, 'cooldown_mult': 4}
                 _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
         elif channel_info['slope'] > 0:
-            if prev['close'] > prev_lower_band and current['close'] < current_lower_band - confirmation_buffer:
+            if prev_close > prev_lower_band and current_close < current_lower_band - confirmation_buffer:
                 signal_info = {'log_name': f"Channel Down",
                                'alert_key': f"{symbol}_{timeframe}_CHAN_DOWN_{config_index}",
                                'volume_must_confirm': channel_params.get('volume_confirm', True),
@@ -544,7 +591,7 @@ def check_trend_channel_breakout(exchange, symbol, timeframe, config, df, channe
                                'title_template': f"📉 {{vol_label}}跌破回归通道: {symbol} ({timeframe})",
                                'message_template': (
                                    "{trend_message}**信号**: **确认跌破上升回归通道**。\n\n> **跌破价格**: `{current_close:.4f}`\n\n{vol_text}"),
-                               'template_data': {"current_close": current['close']}, 'cooldown_mult': 4}
+                               'template_data': {"current_close": current_close}, 'cooldown_mult': 4}
                 _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
     except Exception as e:
         logger.error(f"❌ 通道突破错: {e}")
@@ -556,38 +603,30 @@ def check_consecutive_candles(exchange, symbol, timeframe, config, df, consecuti
                                                          consecutive_params.get('min_consecutive_candles', 4))
         if len(df) < min_n_to_alert + 2: return
 
+        closes, opens = df['close'].to_numpy(), df['open'].to_numpy()
+        direction_masks = {'up': closes > opens, 'down': closes < opens}
+
         def count_backwards(start_index, direction):
-            count = 0
-            for i in range(start_index, -1, -1):
-                candle = df.iloc[i]
-                current_direction = 'up' if candle['close'] > candle['open'] else (
-                    'down' if candle['close'] < candle['open'] else 'none')
-                if current_direction == direction:
-                    count += 1
-                else:
-                    break
-            return count
+            return count_trailing_true(direction_masks[direction][:start_index + 1])
 
-        last_candle, prev_candle = df.iloc[-2], df.iloc[-3]
-        is_last_up, is_last_down = last_candle['close'] > last_candle['open'], last_candle['close'] < last_candle[
-            'open']
-        is_prev_up, is_prev_down = prev_candle['close'] > prev_candle['open'], prev_candle['close'] < prev_candle[
-            'open']
+        is_last_up, is_last_down = direction_masks['up'][-2], direction_masks['down'][-2]
+        is_prev_up, is_prev_down = direction_masks['up'][-3], direction_masks['down'][-3]
+        last_close, last_ts = closes[-2], int(df['timestamp'].iat[-2])
 
         if is_last_up and is_prev_down:
             if (c := count_backwards(len(df) - 3, 'down')) >= min_n_to_alert:
-                signal_info = {'alert_key': f"{symbol}_{timeframe}_REV_UP_{config_index}_{last_candle['timestamp']}",
+                signal_info = {'alert_key': f"{symbol}_{timeframe}_REV_UP_{config_index}_{last_ts}",
                                'title_template': f"🔄 动能衰竭: {symbol} ({timeframe})", 'message_template': (
                         "{trend_message}**空头动能衰竭 (反弹警示)**!\n\n> 连续下跌 **{c}** 根K线后，首现收涨K线。\n> **当前价**: {p:.4f}\n\n请留意止跌企稳迹象。\n\n{vol_text}"),
-                               'template_data': {'c': c, 'p': last_candle['close']},
+                               'template_data': {'c': c, 'p': last_close},
                                'cooldown_logic': 'align_to_period_end', 'always_show_volume': True}
                 _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
         elif is_last_down and is_prev_up:
             if (c := count_backwards(len(df) - 3, 'up')) >= min_n_to_alert:
-                signal_info = {'alert_key': f"{symbol}_{timeframe}_REV_DOWN_{config_index}_{last_candle['timestamp']}",
+                signal_info = {'alert_key': f"{symbol}_{timeframe}_REV_DOWN_{config_index}_{last_ts}",
                                'title_template': f"🔄 动能衰竭: {symbol} ({timeframe})", 'message_template': (
                         "{trend_message}**多头动能衰竭 (回调警示)**!\n\n> 连续上涨 **{c}** 根K线后，首现收跌K线。\n> **当前价**: {p:.4f}\n\n请留意滞涨回调风险。\n\n{vol_text}"),
-                               'template_data': {'c': c, 'p': last_candle['close']},
+                               'template_data': {'c': c, 'p': last_close},
                                'cooldown_logic': 'align_to_period_end', 'always_show_volume': True}
                 _prepare_and_send_notification(config, symbol, timeframe, df, signal_info)
 
@@ -595,10 +634,10 @@ def check_consecutive_candles(exchange, symbol, timeframe, config, df, consecuti
         if current_trend_count >= min_n_to_alert:
             d_text, emoji = ("收涨", "📈") if is_last_up else ("收跌", "📉")
             signal_info = {
-                'alert_key': f"{symbol}_{timeframe}_CONT_{'UP' if is_last_up else 'DOWN'}_{config_index}_{last_candle['timestamp']}",
+                'alert_key': f"{symbol}_{timeframe}_CONT_{'UP' if is_last_up else 'DOWN'}_{config_index}_{last_ts}",
                 'title_template': f"{emoji} 极度强势: {{vol_label}}{symbol} ({timeframe})", 'message_template': (
                     "{trend_message}**单边动能极强**：\n\n> 价格已连续 **{c}** 个周期{d_text}。\n> **当前价**: {p:.4f}\n\n{vol_text}"),
-                'template_data': {'c': current_trend_count, 'd_text': d_text, 'p': last_candle['close']},
+                'template_data': {'c': current_trend_count, 'd_text': d_text, 'p': last_close},
                 'cooldown_logic': 'align_to_period_end', 'always_show_volume': True,
                 'fallback_multiplier': consecutive_params.get('volume_multiplier', 1.5),
                 'volume_must_confirm': consecutive_params.get('volume_confirm', False)}
@@ -607,9 +646,10 @@ def check_consecutive_candles(exchange, symbol, timeframe, config, df, consecuti
         logger.error(f"❌ 连K错: {e}")
 
 
-def check_high_funding_rate(exchange, symbol, timeframe, config, df, fund_params, config_index=0):
+def check_high_funding_rate(exchange, symbol, timeframe, config, df, fund_params, config_index=0, funding_data=None):
     try:
-        funding_data = fetch_funding_rate(exchange, symbol)
+        # 大范围扫描时费率已批量获取并直接传入，否则单独请求
+        if funding_data is None: funding_data = fetch_funding_rate(exchange, symbol)
         if not funding_data or funding_data.get('fundingRate') is None: return
         current_rate = funding_data['fundingRate']
         interval_hours = int(funding_data.get('info', {}).get('fundingIntervalHours', 8))
@@ -1,12 +1,20 @@
 # --- START OF FILE app/analysis/trend.py (CORRECTED V35.2) ---
-import pandas_ta as pta
+import numpy as np
 from loguru import logger
 # 本地应用导入
+from app.analysis.fast_indicators import ema
 from app.utils import timeframe_to_minutes  # <-- 从 utils 导入
 
+# 单轮扫描内的趋势结果缓存: (symbol, timeframe, 最后一根K线时间戳, EMA参数) -> (趋势描述, emoji)
+# 同一 (symbol, timeframe) 的多个策略共用一次 EMA 计算，每轮扫描结束时清空
+_trend_cache = {}
 
-def get_current_trend(df, timeframe, trend_params_config):
-    df_trend = df.copy()
+
+def clear_trend_cache():
+    _trend_cache.clear()
+
+
+def get_current_trend(df, timeframe, trend_params_config, symbol=None):
     tf_minutes = timeframe_to_minutes(timeframe)
     trend_params = trend_params_config.get('trend_ema_short' if tf_minutes <= 60 else 'trend_ema_long',
                                            trend_params_config.get('trend_ema', {}))
@@ -16,21 +24,33 @@ def get_current_trend(df, timeframe, trend_params_config):
         logger.debug(f"趋势EMA参数配置不完整或周期不合法: {trend_params}")
         return "趋势未知", "↔️"
 
-    for name, period in emas.items():
-        df_trend[f'ema_{name}'] = pta.ema(df_trend['close'], length=period)
+    cache_key = None
+    if symbol is not None and 'timestamp' in df.columns and not df.empty:
+        cache_key = (symbol, timeframe, int(df['timestamp'].iat[-1]), emas['fast'], emas['medium'], emas['long'])
+        cached = _trend_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-    required_cols = [f'ema_{name}' for name in emas.keys()]
-    if not all(c in df_trend.columns for c in required_cols):
-        return "趋势未知", "↔️"
+    trend = _compute_trend(df, emas)
+    if cache_key is not None:
+        _trend_cache[cache_key] = trend
+    return trend
+
+
+def _compute_trend(df, emas):
+    # 直接在 close 列上计算三条 EMA，得到独立的 numpy 数组，不复制也不修改传入的 DataFrame
+    close = df['close'].to_numpy(dtype=np.float64)
+    ema_values = {name: ema(close, period) for name, period in emas.items()}
 
-    df_trend = df_trend.dropna()
-    if df_trend.empty:
+    valid = ~(np.isnan(ema_values['fast']) | np.isnan(ema_values['medium']) | np.isnan(ema_values['long']))
+    if not valid.any():
         return "趋势未知", "↔️"
 
-    last = df_trend.iloc[-1]
-    if last['ema_fast'] > last['ema_medium'] and last['ema_medium'] > last['ema_long']:
+    last = np.flatnonzero(valid)[-1]
+    ema_fast, ema_medium, ema_long = ema_values['fast'][last], ema_values['medium'][last], ema_values['long'][last]
+    if ema_fast > ema_medium and ema_medium > ema_long:
         return "多头趋势", "🐂"
-    if last['ema_fast'] < last['ema_medium'] and last['ema_medium'] < last['ema_long']:
+    if ema_fast < ema_medium and ema_medium < ema_long:
         return "空头趋势", "🐻"
 
     return "震荡趋势", "↔️"
@@ -2,8 +2,18 @@
 from loguru import logger  # 全局对象
 import os
 
+# 当前是否输出 DEBUG 日志；热路径上拼接调试字符串之前先检查，关闭时完全跳过格式化
+_debug_enabled = True
+
+
+def is_debug_enabled():
+    return _debug_enabled
+
 
 def setup_logging(level="INFO"):
+    global _debug_enabled
+    _debug_enabled = logger.level(level.upper()).no <= logger.level("DEBUG").no
+
     # 1. 创建日志目录
     log_dir = "log"
     os.makedirs(log_dir, exist_ok=True)
@@ -15,8 +25,9 @@ def setup_logging(level="INFO"):
     logger.add(
         sink=lambda msg: print(msg, end=""),
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level:8}</level> | <cyan>{module}.{function}:{line}</cyan> - {message}",
-        level=level,
-        colorize=True
+        level=level.upper(),
+        colorize=True,
+        enqueue=True  # 扫描线程只把日志放入队列，由后台线程负责输出，不在热路径上阻塞
     )
 
     # 4. 文件输出
@@ -27,7 +38,7 @@ def setup_logging(level="INFO"):
         retention="7 days",
         compression="zip",
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level:8}</level> | <cyan>{module}.{function}:{line}</cyan> - {message}",
-        level=level,
+        level=level.upper(),
         enqueue=True
     )
 
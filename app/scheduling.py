@@ -0,0 +1,74 @@
+# --- START OF FILE app/scheduling.py ---
+from apscheduler.executors.pool import ThreadPoolExecutor as SchedulerThreadPool
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from loguru import logger
+
+# 本地应用导入
+from app.tasks.periodic_reporter import run_periodic_report
+from app.tasks.signal_scanner import run_signal_check_cycle, refresh_top_symbols, get_top_symbols_refresh_minutes
+from app.utils import timeframe_to_minutes
+
+SCHEDULER_TIMEZONE = 'Asia/Shanghai'
+
+
+def create_scheduler():
+    """
+    创建调度器。扫描与报告各自在内部使用线程池并发请求，调度器本身只需少量线程；
+    同一任务不允许重叠执行，错过的多次触发合并为一次。
+    """
+    return BlockingScheduler(
+        timezone=SCHEDULER_TIMEZONE,
+        executors={'default': SchedulerThreadPool(max_workers=4)},
+        job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 60})
+
+
+def build_report_triggers(report_configs):
+    """
+    校验所有已启用的周期报告配置，返回 [(报告名, CronTrigger, report_conf), ...]。
+    间隔无法整除24小时的报告会被跳过。
+    """
+    triggers = []
+    for idx, report_conf in enumerate(report_configs):
+        if not report_conf.get('enabled', False):
+            continue
+        report_name = report_conf.get('report_name', f'报告任务-{idx + 1}')
+        run_interval_str = report_conf.get('run_interval', '4h')
+
+        run_interval_minutes = timeframe_to_minutes(run_interval_str)
+        if run_interval_minutes == 0 or (run_interval_minutes < 1440 and 1440 % run_interval_minutes != 0):
+            logger.error(f"❌ 报告 '{report_name}' 的间隔 '{run_interval_str}' 无效 (无法被24小时整除)，将跳过此任务。")
+            continue
+
+        if run_interval_str == '1d':
+            # 日报，在北京时间每天早上8点运行
+            trigger = CronTrigger(hour='8', minute='0', second='10', timezone=SCHEDULER_TIMEZONE)
+        else:  # 小时报告
+            trigger_hours = ",".join(map(str, range(0, 24, run_interval_minutes // 60)))
+            trigger = CronTrigger(hour=trigger_hours, minute='0', second='10', timezone=SCHEDULER_TIMEZONE)
+        triggers.append((report_name, trigger, report_conf))
+    return triggers
+
+
+def configure_scheduler(scheduler, exchange, config):
+    """ 注册所有周期报告任务以及主信号扫描任务。 """
+    report_configs = config.get('periodic_reports', [])
+    if report_configs:
+        logger.info("正在配置周期性报告任务...")
+        for report_name, trigger, report_conf in build_report_triggers(report_configs):
+            scheduler.add_job(run_periodic_report, trigger, args=[exchange, config, report_conf], name=report_name)
+            logger.info(f"   - ✅ 已添加 '{report_name}'，调度规则: {trigger}。")
+
+    interval_minutes = config.get('app_settings', {}).get('check_interval_minutes', 15)
+    # 错过的触发在半个扫描间隔内仍会补跑 (多次错过合并为一次)，更晚则直接等下一次
+    scheduler.add_job(run_signal_check_cycle, IntervalTrigger(minutes=interval_minutes), args=[exchange, config],
+                      name="SignalCheckCycle", misfire_grace_time=interval_minutes * 30)
+    logger.info(f"   - 动态热点监控任务已添加，每 {interval_minutes} 分钟运行一次。")
+
+    if config.get('market_settings', {}).get('dynamic_scan', {}).get('enabled', False):
+        refresh_minutes = get_top_symbols_refresh_minutes(config)
+        scheduler.add_job(refresh_top_symbols, IntervalTrigger(minutes=refresh_minutes), args=[exchange, config],
+                          name="TopSymbolsRefresh")
+        logger.info(f"   - 热门币种列表后台刷新任务已添加，每 {refresh_minutes} 分钟运行一次。")
+# --- END OF FILE app/scheduling.py ---
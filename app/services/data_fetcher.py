@@ -1,9 +1,77 @@
+import random
+import threading
 import time
+from concurrent.futures import Future
+
+import ccxt
+import numpy as np
 import pandas as pd
 import requests
 import json
 from loguru import logger
-from collections import defaultdict
+
+from app.utils import timeframe_to_minutes
+
+# fetch_tickers 结果的共享缓存，避免同一周期内多个任务重复拉取全市场行情
+TICKERS_CACHE_TTL_SECONDS = 60
+_tickers_cache = (0.0, None, None)  # (过期时间, 交易所ID, tickers)
+_tickers_cache_lock = threading.Lock()
+
+# 进程级共享的交易所请求限流器 (TokenBucket)，由 main 在启动时设置
+_rate_limiter = None
+
+
+def set_rate_limiter(limiter):
+    global _rate_limiter
+    _rate_limiter = limiter
+
+
+def _throttle():
+    if _rate_limiter is not None:
+        _rate_limiter.acquire()
+
+
+# 限流/网络类错误的重试策略：指数退避 + 随机抖动，避免多个线程同时重试
+API_MAX_ATTEMPTS = 3
+API_RETRY_BASE_DELAY = 0.5
+
+# 正在进行中的 OHLCV 请求，相同 (symbol, timeframe, limit) 的并发调用共享同一次请求
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+# 主扫描与周期报告共用的K线缓存 (exchange.id, symbol, timeframe) -> DataFrame，下次运行只拉取增量部分
+_ohlcv_tail_cache = {}
+_ohlcv_tail_cache_lock = threading.Lock()
+
+# 交易所返回 BadSymbol (已下架或不存在) 的交易对 -> 重新尝试的时间 (time.monotonic())，期间扫描直接跳过，不再每轮重复请求和报错。
+# 带有效期并在热门币种刷新成功后清空：启动时市场信息加载失败、或交易对重新上线时不会被永久跳过
+BAD_SYMBOL_RETRY_SECONDS = 6 * 3600
+_bad_symbols = {}
+
+
+def is_bad_symbol(symbol):
+    retry_at = _bad_symbols.get(symbol)
+    return retry_at is not None and time.monotonic() < retry_at
+
+
+def clear_bad_symbols():
+    _bad_symbols.clear()
+
+
+def _call_with_retry(func, *args, **kwargs):
+    for attempt in range(API_MAX_ATTEMPTS):
+        try:
+            _throttle()
+            return func(*args, **kwargs)
+        except ccxt.NetworkError as e:  # 包含 RateLimitExceeded / DDoSProtection
+            if attempt == API_MAX_ATTEMPTS - 1:
+                raise
+            delay = API_RETRY_BASE_DELAY * (2 ** attempt) + random.uniform(0, API_RETRY_BASE_DELAY)
+            if isinstance(e, ccxt.DDoSProtection) and _rate_limiter is not None:
+                # 被交易所限流 (RateLimitExceeded 是其子类)：让共享令牌桶整体暂停，其他线程不再继续撞限流
+                _rate_limiter.pause(delay)
+            logger.debug(f"{func.__name__} 请求失败 ({type(e).__name__})，{delay:.2f}s 后重试 ({attempt + 1}/{API_MAX_ATTEMPTS})")
+            time.sleep(delay)
 
 
 def fetch_fear_greed_index():
@@ -35,7 +103,7 @@ def fetch_funding_rate(exchange, symbol):
     """
     try:
         # 大多数交易所 (Binance, OKX, Bybit) 都支持此方法
-        funding_info = exchange.fetch_funding_rate(symbol)
+        funding_info = _call_with_retry(exchange.fetch_funding_rate, symbol)
         return funding_info
     except AttributeError:
         # 如果交易所不支持 fetch_funding_rate (较少见)
@@ -46,6 +114,34 @@ def fetch_funding_rate(exchange, symbol):
         return None
 
 
+def fetch_funding_rates_bulk(exchange, symbols):
+    """
+    一次请求批量获取多个交易对的资金费率，返回 {symbol: funding_info}。
+    交易所不支持批量接口或请求失败时返回 None，由调用方退回逐个获取。
+    """
+    if not exchange.has.get('fetchFundingRates'):
+        return None
+    try:
+        return _call_with_retry(exchange.fetch_funding_rates, symbols)
+    except Exception as e:
+        logger.debug(f"批量获取资金费率失败，改为逐个获取: {e}")
+        return None
+
+
+def _fetch_tickers_cached(exchange):
+    """ 在 TTL 内复用上一次 fetch_tickers 的结果；并发调用者会等待同一次请求完成。 """
+    global _tickers_cache
+    with _tickers_cache_lock:
+        expiry, exchange_id, tickers = _tickers_cache
+        if tickers is not None and exchange_id == exchange.id and time.monotonic() < expiry:
+            logger.debug(f"...复用 {TICKERS_CACHE_TTL_SECONDS}s 内缓存的行情数据...")
+            return tickers
+        _throttle()
+        tickers = exchange.fetch_tickers()
+        _tickers_cache = (time.monotonic() + TICKERS_CACHE_TTL_SECONDS, exchange.id, tickers)
+        return tickers
+
+
 def get_top_n_symbols_by_volume(exchange, top_n=100, exclude_list=[], market_type='swap', retries=5, config=None,
                                 ignore_adv_filters=False):
     scan_conf = config.get('market_settings', {}).get('dynamic_scan', {}) if config else {}
@@ -57,6 +153,7 @@ def get_top_n_symbols_by_volume(exchange, top_n=100, exclude_list=[], market_typ
         cross_filter_enabled = cross_filter_conf.get('enabled', False)
 
     must_exist_quotes = set([q.upper() for q in scan_conf.get('cross_market_filter', {}).get('must_exist_in', [])])
+    exclude_set = frozenset(exclude_list)
 
     logger.info(f"...正在从 {exchange.id} 获取所有交易对的24h行情数据 (目标市场: {market_type})...")
     logger.info(f"主计价货币: {primary_quote}")
@@ -74,57 +171,44 @@ def get_top_n_symbols_by_volume(exchange, top_n=100, exclude_list=[], market_typ
 
     for i in range(retries):
         try:
-            tickers = exchange.fetch_tickers()
+            tickers = _fetch_tickers_cached(exchange)
             logger.info(f"...获取成功，共 {len(tickers)} 个ticker，正在处理...")
 
-            base_to_quotes_map = defaultdict(set)
-            primary_market_tickers = {}
-
-            for symbol_str, ticker in tickers.items():
-                if not ticker: continue
+            # 只抽取筛选需要的字段，组成一张表后用向量化的掩码完成市场/计价/黑名单过滤
+            ticker_items = [(symbol_str, ticker) for symbol_str, ticker in tickers.items() if ticker]
+            symbols = pd.Series([ticker.get('symbol', symbol_str) for symbol_str, ticker in ticker_items], dtype=object)
+            has_colon = symbols.str.contains(':', regex=False)
+            is_swap = pd.Series([bool(ticker.get('swap', False)) for _, ticker in ticker_items], dtype=bool) | has_colon
+            is_spot = pd.Series([bool(ticker.get('spot', False)) for _, ticker in ticker_items], dtype=bool) | \
+                      (symbols.str.contains('/', regex=False) & ~is_swap)
+            derived_base = symbols.str.split('/').str[0].str.split(':').str[0]
+            derived_quote = symbols.str.split(':').str[-1].where(has_colon, symbols.str.split('/').str[-1])
+            markets = pd.DataFrame({
+                'symbol': symbols,
+                'base': pd.Series([ticker.get('base') for _, ticker in ticker_items], dtype=object).fillna(derived_base).str.upper(),
+                'quote': pd.Series([ticker.get('quote') for _, ticker in ticker_items], dtype=object).fillna(derived_quote).str.upper(),
+                'volume': pd.to_numeric(pd.Series([ticker.get('quoteVolume') for _, ticker in ticker_items], dtype=object)).fillna(0.0),
+            })
 
-                symbol = ticker.get('symbol', symbol_str)
-                is_swap = ticker.get('swap', False) or ':' in symbol
-                if market_type == 'swap' and not is_swap: continue
+            market_mask = ~markets['base'].isin(exclude_set)
+            if market_type == 'swap': market_mask &= is_swap
+            if market_type == 'spot': market_mask &= is_spot
+            markets = markets[market_mask]
 
-                is_spot = ticker.get('spot', False) or '/' in symbol and not is_swap
-                if market_type == 'spot' and not is_spot: continue
-
-                base = ticker.get('base', symbol.split('/')[0].split(':')[0]).upper()
-                quote = ticker.get('quote', symbol.split(':')[-1] if ':' in symbol else symbol.split('/')[-1]).upper()
-
-                if base in exclude_list:
-                    continue
-
-                base_to_quotes_map[base].add(quote)
-
-                if quote == primary_quote:
-                    primary_market_tickers[base] = ticker
-
-            candidate_bases = set()
+            # 同一 base 在主计价市场出现多次时，与原先的字典覆盖一致，保留最后一条
+            primary_markets = markets[markets['quote'] == primary_quote].drop_duplicates('base', keep='last')
 
             if cross_filter_enabled and must_exist_quotes and not ignore_adv_filters:
                 required_quotes_for_check = must_exist_quotes.union({primary_quote})
-                for base, existing_quotes in base_to_quotes_map.items():
-                    if required_quotes_for_check.issubset(existing_quotes):
-                        candidate_bases.add(base)
+                quotes_by_base = markets.groupby('base')['quote'].agg(set)
+                candidate_bases = set(quotes_by_base.index[quotes_by_base.map(required_quotes_for_check.issubset)])
                 logger.info(f"通过跨市场验证的币种有 {len(candidate_bases)} 个。")
-            else:
-                candidate_bases = set(primary_market_tickers.keys())
-
-            dynamic_candidates = []
-            for base in candidate_bases:
-                if base in primary_market_tickers:
-                    ticker = primary_market_tickers[base]
-                    if ticker.get('quoteVolume', 0) > 0:
-                        dynamic_candidates.append({
-                            'symbol': ticker['symbol'],
-                            'volume': ticker['quoteVolume']
-                        })
-
-            sorted_tickers = sorted(dynamic_candidates, key=lambda x: x['volume'], reverse=True)[:top_n]
+                primary_markets = primary_markets[primary_markets['base'].isin(candidate_bases)]
+
+            dynamic_candidates = primary_markets[primary_markets['volume'] > 0]
+            sorted_tickers = dynamic_candidates.nlargest(top_n, 'volume')
             logger.info(f"✅ 成功筛选出 {len(sorted_tickers)} 个动态交易对。")
-            return [t['symbol'] for t in sorted_tickers]
+            return sorted_tickers['symbol'].tolist()
 
         except Exception as e:
             logger.warning(f"获取行情数据失败 (尝试 {i + 1}/{retries}): {e}")
@@ -136,13 +220,97 @@ def get_top_n_symbols_by_volume(exchange, top_n=100, exclude_list=[], market_typ
     return []
 
 
-def fetch_ohlcv_data(exchange, symbol, timeframe, limit):
+def _ohlcv_to_df(ohlcv):
+    """
+    把 ccxt 返回的 [[ts, o, h, l, c, v], ...] 一次性转为 float64 二维数组，再按列构造 DataFrame，
+    避免 pandas 逐行推断类型。K线时间戳在这里统一为 int64 毫秒 (UTC)，下游无需再判断类型或转换整列。
+    """
+    arr = np.asarray(ohlcv, dtype=np.float64)
+    return pd.DataFrame({'timestamp': arr[:, 0].astype(np.int64), 'open': arr[:, 1], 'high': arr[:, 2],
+                         'low': arr[:, 3], 'close': arr[:, 4], 'volume': arr[:, 5]})
+
+
+# 少于该根数的K线不足以计算任何策略
+MIN_OHLCV_BARS = 50
+
+
+def _fetch_ohlcv_df(exchange, symbol, timeframe, limit):
     try:
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-        if not ohlcv or len(ohlcv) < 50:
-            return None
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        return df
+        ohlcv = _call_with_retry(exchange.fetch_ohlcv, symbol, timeframe, limit=limit)
+        if not ohlcv or len(ohlcv) < MIN_OHLCV_BARS:
+            # 新上市币种历史K线不足：返回空表，与获取失败 (None) 区分开，调用方不必把它当作错误
+            return _ohlcv_to_df(np.empty((0, 6)))
+        return _ohlcv_to_df(ohlcv)
+    except ccxt.BadSymbol as e:
+        if not is_bad_symbol(symbol):
+            logger.warning(f"⚠️ {symbol} 不是有效的交易对，{BAD_SYMBOL_RETRY_SECONDS // 3600} 小时内的扫描将跳过: {e}")
+        _bad_symbols[symbol] = time.monotonic() + BAD_SYMBOL_RETRY_SECONDS
+        return None
     except Exception as e:
         logger.debug(f"为 {symbol} {timeframe} 获取OHLCV数据失败: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def fetch_ohlcv_data(exchange, symbol, timeframe, limit):
+    key = (exchange.id, symbol, timeframe, limit)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _inflight[key] = future
+
+    if not is_owner:
+        # 已有线程在请求同样的数据，等待其结果；返回副本以免调用方之间互相修改
+        df = future.result()
+        return df.copy() if df is not None else None
+
+    try:
+        df = _fetch_ohlcv_df(exchange, symbol, timeframe, limit)
+        future.set_result(df)
+        return df
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def fetch_ohlcv_incremental(exchange, symbol, timeframe, limit):
+    """
+    缓存上一次的K线，之后只用 since 拉取最后一根已缓存K线 (可能尚未收盘) 及之后的部分，
+    与缓存拼接后返回最近 limit 根。同一K线周期内的多次扫描只需请求 1~2 根K线。
+    缓存不足或间隔太久 (预计增量不少于 limit 根) 时退回完整拉取。
+    返回的是副本，调用方可以随意追加列。获取失败返回 None；历史K线不足 MIN_OHLCV_BARS 根时返回空 DataFrame。
+    """
+    key = (exchange.id, symbol, timeframe)
+    with _ohlcv_tail_cache_lock:
+        cached = _ohlcv_tail_cache.get(key)
+
+    df = None
+    if cached is not None and len(cached) >= limit:
+        since = int(cached['timestamp'].iat[-1])
+        tf_ms = timeframe_to_minutes(timeframe) * 60000
+        # since 之后 (含) 应有的K线数再多请求 1 根；返回数量小于请求数才说明已取到最新
+        tail_limit = (int(time.time() * 1000) - since) // tf_ms + 2 if tf_ms > 0 else limit
+        if tail_limit < limit:
+            try:
+                ohlcv = _call_with_retry(exchange.fetch_ohlcv, symbol, timeframe, since=since, limit=tail_limit)
+                if ohlcv and len(ohlcv) < tail_limit:
+                    tail = _ohlcv_to_df(ohlcv)
+                    head = cached[cached['timestamp'] < tail['timestamp'].iat[0]]
+                    # 缓存保留较长的那份，主扫描与报告对同一周期请求不同长度时不会互相挤掉
+                    df = pd.concat([head, tail], ignore_index=True).tail(len(cached)).reset_index(drop=True)
+            except Exception as e:
+                logger.debug(f"为 {symbol} {timeframe} 增量获取OHLCV数据失败，改为完整拉取: {e}")
+
+    if df is None:
+        df = fetch_ohlcv_data(exchange, symbol, timeframe, limit)
+        if df is None or df.empty:
+            return df
+        df = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+
+    with _ohlcv_tail_cache_lock:
+        _ohlcv_tail_cache[key] = df
+    return df.tail(limit).reset_index(drop=True)
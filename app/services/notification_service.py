@@ -6,14 +6,33 @@ import json
 import queue
 import time
 import urllib.parse
+from functools import lru_cache
 
 import requests
+from requests.adapters import HTTPAdapter
 from plyer import notification
 from loguru import logger
 
 # 【核心修正】: 只从 state 导入队列
 from app.state import notification_queue
 
+# 通知消费者线程复用同一个 HTTP 会话，连续告警时保持与钉钉的 keep-alive 连接，避免每条消息重新握手
+_dingtalk_session = requests.Session()
+_dingtalk_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+
+@lru_cache(maxsize=8)
+def make_signer(secret):
+    """ 为固定的 secret 生成签名函数，secret 的编码只在首次调用时做一次，之后每条消息只需传入时间戳。 """
+    secret_enc = secret.encode('utf-8')
+
+    def sign(timestamp):
+        string_to_sign = f'{timestamp}\n{secret}'
+        hmac_code = hmac.new(secret_enc, string_to_sign.encode('utf-8'), digestmod=hashlib.sha256).digest()
+        return urllib.parse.quote_plus(base64.b64encode(hmac_code))
+
+    return sign
+
 
 def _send_desktop_notification(title, message, timeout=10):
     try:
@@ -36,15 +55,12 @@ def _send_dingtalk_request(config, payload):
     url_with_sign = webhook_url
     if secret:
         timestamp = str(round(time.time() * 1000))
-        secret_enc = secret.encode('utf-8');
-        string_to_sign = f'{timestamp}\n{secret}'
-        hmac_code = hmac.new(secret_enc, string_to_sign.encode('utf-8'), digestmod=hashlib.sha256).digest()
-        sign = urllib.parse.quote_plus(base64.b64encode(hmac_code))
+        sign = make_signer(secret)(timestamp)
         url_with_sign = f"{webhook_url}&timestamp={timestamp}&sign={sign}"
 
     try:
-        response = requests.post(url_with_sign, data=json.dumps(payload), headers={'Content-Type': 'application/json'},
-                                 timeout=60)
+        response = _dingtalk_session.post(url_with_sign, data=json.dumps(payload), headers={'Content-Type': 'application/json'},
+                                          timeout=60)
         if response.json().get('errcode') == 0:
             return True
         else:
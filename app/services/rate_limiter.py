@@ -0,0 +1,43 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶限流器，所有扫描线程共享同一个实例。
+    令牌充足时立即放行，只有在桶被取空时才阻塞，从而让多线程并发到交易所允许的速率上限。
+
+    :param capacity: 桶容量，即允许的最大突发请求数。
+    :param refill_rate: 每秒补充的令牌数，即持续请求速率。
+    """
+
+    def __init__(self, capacity, refill_rate):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.refill_rate)
+        self._last_refill = now
+
+    def acquire(self, tokens=1):
+        with self._cond:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                # 令牌只会随时间增加，按缺口计算需要等待的时间
+                self._cond.wait((tokens - self._tokens) / self.refill_rate)
+
+    def pause(self, seconds):
+        """
+        交易所返回限流错误时调用：把令牌余额压到负数，所有线程在接下来的 seconds 秒内都拿不到令牌，
+        之后再按正常速率恢复。
+        """
+        with self._cond:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.refill_rate)
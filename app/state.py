@@ -1,42 +1,182 @@
+import heapq
 import json
-from datetime import datetime, timezone
+import os
 import queue
+import sqlite3
+import threading
+import time
+import pandas as pd
 from loguru import logger
 
-ALERT_STATUS_FILE = 'cooldown_status.json'
+ALERT_STATE_DB = 'data/cooldown.db'
+# 冷却状态的批量落库间隔 (秒)：告警只标记脏数据，由后台线程统一写入
+ALERT_STATE_FLUSH_INTERVAL_SECONDS = 5
+# 旧版 JSON 冷却状态文件，仅在首次创建数据库时用于迁移
+LEGACY_ALERT_STATUS_FILE = 'cooldown_status.json'
 
 # 全局共享的状态变量
-alerted_states = {}
+alerted_states = {}  # 信号 key -> 冷却到期时间 (Unix 秒)
 cached_top_symbols = []
+# 排名快照 (symbol -> 排名 (从 1 开始), 币种数, 排名 -> 动态值 的查找表缓存)。
+# 刷新热门币种时整体替换引用，扫描线程拿到的排名与查找表总是来自同一份列表
+_symbol_rank_snapshot = ({}, 0, {})
+_top_symbols_expiry = 0.0  # 主扫描热门币种列表的有效期 (time.monotonic())，0 表示需要重新获取
 notification_queue = queue.Queue()
 
+# 冷却状态持久化：alerted_states 作为内存缓存，只把变更过的 key 写入 SQLite
+_state_lock = threading.Lock()
+_db_lock = threading.Lock()  # 串行化对共享 SQLite 连接的访问
+_dirty_keys = set()
+_expiry_heap = []  # (到期时间, key) 小顶堆，用于按到期顺序惰性清理 alerted_states
+_db_conn = None
+_db_closed = False  # close_alert_state_db 之后为 True，不再重新打开数据库
+_flush_thread = None
+_flush_stop = threading.Event()
+
+
+def _import_legacy_json(conn):
+    try:
+        with open(LEGACY_ALERT_STATUS_FILE, 'r') as f:
+            data = json.load(f)
+    except (FileNotFoundError, IsADirectoryError, json.JSONDecodeError):
+        return
+    # 一次性向量化解析全部时间戳 (无时区的按 UTC 处理)，无法解析的条目记为 NaT 并丢弃
+    expiries = pd.to_datetime(list(data.values()), utc=True, format='ISO8601', errors='coerce')
+    epoch_seconds = (expiries - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)
+    rows = [(k, ts) for k, ts in zip(data.keys(), epoch_seconds) if not pd.isna(ts)]
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO alerts VALUES(?, ?)", rows)
+    logger.info(f"ℹ️ 已从 {LEGACY_ALERT_STATUS_FILE} 迁移 {len(rows)} 条冷却状态到 {ALERT_STATE_DB}。")
+
+
+def _get_db():
+    global _db_conn
+    if _db_closed:
+        raise sqlite3.ProgrammingError("冷却状态数据库已关闭")
+    if _db_conn is None:
+        db_dir = os.path.dirname(ALERT_STATE_DB)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        is_new_db = not os.path.exists(ALERT_STATE_DB)
+        conn = sqlite3.connect(ALERT_STATE_DB, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS alerts(key TEXT PRIMARY KEY, expiry REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_expiry ON alerts(expiry)")
+        conn.commit()
+        if is_new_db:
+            _import_legacy_json(conn)
+        _db_conn = conn
+    return _db_conn
+
+
+def set_cached_top_symbols(symbols, ttl_seconds=None):
+    """
+    原地替换热门币种列表，并在旁边建好新的排名快照后一次性替换 (查找表缓存随之清空)。
+    ttl_seconds 为空时 (静态币种列表) 视为已失效；动态扫描开启时主扫描下一轮会重新获取。
+    """
+    global _top_symbols_expiry, _symbol_rank_snapshot
+    symbols = list(symbols)
+    ranks = {s: i + 1 for i, s in enumerate(symbols)}
+    cached_top_symbols[:] = symbols
+    _symbol_rank_snapshot = (ranks, len(symbols), {})
+    _top_symbols_expiry = time.monotonic() + ttl_seconds if ttl_seconds else 0.0
+
+
+def get_symbol_rank_snapshot():
+    return _symbol_rank_snapshot
+
+
+def is_top_symbols_cache_fresh():
+    return bool(cached_top_symbols) and time.monotonic() < _top_symbols_expiry
+
 
 # 状态操作函数
 def load_alert_states():
-    global alerted_states
     try:
-        with open(ALERT_STATUS_FILE, 'r') as f:
-            data = json.load(f)
-        loaded_states = {k: datetime.fromisoformat(v).replace(tzinfo=timezone.utc) if datetime.fromisoformat(
-            v).tzinfo is None else datetime.fromisoformat(v) for k, v in data.items()}
-        now_utc = datetime.now(timezone.utc)
-        initial_count = len(loaded_states)
-        alerted_states.clear()
-        alerted_states.update({k: v for k, v in loaded_states.items() if v > now_utc})
-        logger.info(f"✅ 成功加载冷却状态。有效条目: {len(alerted_states)} (从 {initial_count} 个中加载)")
-    except (FileNotFoundError, json.JSONDecodeError):
-        logger.info("ℹ️ 未找到或无法解析冷却状态文件。");
+        with _db_lock:
+            rows = _get_db().execute("SELECT key, expiry FROM alerts WHERE expiry > ?", (time.time(),)).fetchall()
+        with _state_lock:
+            alerted_states.clear()
+            alerted_states.update(rows)
+            _expiry_heap[:] = [(expiry, k) for k, expiry in rows]
+            heapq.heapify(_expiry_heap)
+            _dirty_keys.clear()
+        logger.info(f"✅ 成功加载冷却状态。有效条目: {len(alerted_states)}")
+    except sqlite3.Error as e:
+        logger.error(f"❌ 无法读取冷却状态数据库: {e}")
         alerted_states.clear()
 
 
+def _evict_expired(now_ts):
+    """ 从堆顶依次弹出已到期的条目；key 若已被更新为新的到期时间则保留。调用方需持有 _state_lock。 """
+    while _expiry_heap and _expiry_heap[0][0] <= now_ts:
+        expiry, key = heapq.heappop(_expiry_heap)
+        if alerted_states.get(key) == expiry:
+            del alerted_states[key]
+
+
+def set_alert_state(key, expiry):
+    """ 更新某个信号的冷却到期时间 (datetime)，以 Unix 秒保存，并标记为待持久化。 """
+    expiry_ts = expiry.timestamp()
+    with _state_lock:
+        alerted_states[key] = expiry_ts
+        _dirty_keys.add(key)
+        heapq.heappush(_expiry_heap, (expiry_ts, key))
+        _evict_expired(time.time())
+
+
 def save_alert_states():
-    global alerted_states
     try:
-        now_utc = datetime.now(timezone.utc)
-        active_states = {k: v for k, v in alerted_states.items() if v > now_utc}
-        alerted_states.clear()
-        alerted_states.update(active_states)
-        with open(ALERT_STATUS_FILE, 'w') as f:
-            json.dump({k: v.isoformat() for k, v in active_states.items()}, f, indent=4)
+        now_ts = time.time()
+        # _db_lock 保证多次保存按快照顺序落库；_state_lock 只在内存清理和快照期间持有，
+        # 数据库写入不会阻塞扫描线程
+        with _db_lock:
+            if _db_closed:
+                logger.warning("⚠️ 冷却状态数据库已关闭，本次变更不再落库。")
+                return
+            with _state_lock:
+                _evict_expired(now_ts)
+                dirty_rows = [(k, alerted_states[k]) for k in _dirty_keys if k in alerted_states]
+                _dirty_keys.clear()
+            conn = _get_db()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO alerts VALUES(?, ?)", dirty_rows)
+                conn.execute("DELETE FROM alerts WHERE expiry < ?", (now_ts,))
     except Exception as e:
-        logger.error(f"❌ 保存冷却状态到文件时出错: {e}", exc_info=True)
\ No newline at end of file
+        logger.error(f"❌ 保存冷却状态到数据库时出错: {e}", exc_info=True)
+
+
+def _flush_alert_states_loop(interval):
+    while not _flush_stop.wait(interval):
+        if _dirty_keys:
+            save_alert_states()
+
+
+def start_alert_state_flusher(interval=ALERT_STATE_FLUSH_INTERVAL_SECONDS):
+    """ 启动后台守护线程，每隔 interval 秒把有变更的冷却状态批量写入数据库。 """
+    global _flush_thread
+    if _flush_thread is not None and _flush_thread.is_alive():
+        return
+    _flush_thread = threading.Thread(target=_flush_alert_states_loop, args=(interval,), name='AlertStateFlusher',
+                                     daemon=True)
+    _flush_thread.start()
+
+
+def close_alert_state_db():
+    """ 退出时调用：先停止后台落库线程，再写入剩余的脏数据，做一次 WAL checkpoint 后关闭数据库连接。 """
+    global _db_conn, _db_closed
+    _flush_stop.set()
+    if _flush_thread is not None:
+        _flush_thread.join()  # 等待其可能正在进行的一次落库完成
+    save_alert_states()
+    with _db_lock:
+        _db_closed = True
+        if _db_conn is None:
+            return
+        try:
+            _db_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            _db_conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"❌ 关闭冷却状态数据库时出错: {e}")
+        _db_conn = None
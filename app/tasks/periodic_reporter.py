@@ -1,37 +1,26 @@
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import pandas_ta as pta
 import numpy as np
-from app.services.data_fetcher import get_top_n_symbols_by_volume, fetch_ohlcv_data, fetch_fear_greed_index
+from app.analysis.indicators import count_trailing_true
+from app.services.data_fetcher import get_top_n_symbols_by_volume, fetch_ohlcv_incremental, fetch_fear_greed_index
 from app.services.notification_service import send_alert
-from app.state import cached_top_symbols
+from app.utils import resolve_quote_and_market, format_symbol
 from loguru import logger
 
 
-def _get_symbol_in_primary_market(base_symbol, config):
-    primary_quote = config.get('market_settings', {}).get('dynamic_scan', {}).get('primary_quote_currency',
-                                                                                  'USDT').upper()
-    market_type = config.get('app_settings', {}).get('default_market_type', 'swap')
-
-    if market_type == 'swap':
-        if primary_quote == "USDT":
-            return f"{base_symbol.upper()}/USDT:USDT"
-        return f"{base_symbol.upper()}/{primary_quote}:{primary_quote}"
-    else:  # spot
-        return f"{base_symbol.upper()}/{primary_quote}"
-
-
-def _update_cache_for_report(exchange, config, report_conf):
+def _get_report_symbols(exchange, config, report_conf):
+    """
+    获取本次报告使用的热门币种列表 (动态 + 静态)。
+    只在报告内部使用，不改写主扫描的热门币种缓存与排名快照，主扫描的刷新节奏不受报告影响。
+    """
     report_name = report_conf.get("report_name", "报告任务")
-    logger.info(f" ({report_name})正在更新热门币种缓存...")
+    logger.info(f" ({report_name})正在获取热门币种列表...")
     dyn_scan_conf = config.get('market_settings', {}).get('dynamic_scan', {})
-    top_n_for_signals = dyn_scan_conf.get('top_n_for_signals', 100)
-    top_n_for_report = report_conf.get('top_n_by_volume', 100)
-    fetch_n = max(top_n_for_signals, top_n_for_report)
 
     dynamic_symbols_list = get_top_n_symbols_by_volume(
         exchange,
-        top_n=fetch_n,
+        top_n=report_conf.get('top_n_by_volume', 100),
         exclude_list=[s.upper() for s in dyn_scan_conf.get('exclude_symbols', [])],
         market_type=config.get('app_settings', {}).get('default_market_type', 'swap'),
         config=config,
@@ -39,16 +28,65 @@ def _update_cache_for_report(exchange, config, report_conf):
     )
 
     static_bases = config.get('market_settings', {}).get('static_symbols', [])
-    static_symbols_list = [_get_symbol_in_primary_market(base, config) for base in static_bases]
+    primary_quote, market_type = resolve_quote_and_market(config)
+    static_symbols_list = [format_symbol(base, primary_quote, market_type) for base in static_bases]
 
     final_list = list(dynamic_symbols_list)
     for s in static_symbols_list:
         if s not in final_list:
             final_list.append(s)
 
-    cached_top_symbols.clear()
-    cached_top_symbols.extend(final_list)
-    logger.info(f"✅ ({report_name})热门币种缓存已更新，当前共监控 {len(cached_top_symbols)} 个交易对。")
+    logger.info(f"✅ ({report_name})热门币种列表已获取，共 {len(final_list)} 个交易对。")
+    return final_list
+
+
+def _analyze_symbol_for_report(exchange, symbol, index, report_tf, required_len, report_conf, sentiment_conf):
+    """
+    拉取单个币种的K线并计算报告所需的各项指标。
+    返回 (涨幅条目, 连涨条目, 放量条目, RSI条目)，不满足条件的项为 None。
+    """
+    gain_item = consec_item = vol_item = rsi_item = None
+    try:
+        df = fetch_ohlcv_incremental(exchange, symbol, report_tf, limit=required_len)
+        if df is None or len(df) < report_conf.get('volume_ma_period', 20) + 2:
+            return gain_item, consec_item, vol_item, rsi_item
+
+        last_closed_candle = df.iloc[-2]
+        if last_closed_candle['open'] > 0:
+            gain_item = {'symbol': symbol,
+                         'gain': ((last_closed_candle['close'] - last_closed_candle['open']) /
+                                  last_closed_candle['open']) * 100}
+
+        # 从最后一根已收盘K线往前数连续收涨的根数
+        is_up = df['close'].to_numpy() > df['open'].to_numpy()
+        count = count_trailing_true(is_up[:-1])
+        if count >= report_conf.get('min_consecutive_candles', 2):
+            consec_item = {'symbol': symbol, 'candles': count}
+
+        # 最后一根已收盘K线之前 volume_ma_period 根的均量 (等价于 rolling().mean().shift(1) 取倒数第二行)
+        volume_ma_period = report_conf.get('volume_ma_period', 20)
+        vol_ma = df['volume'].to_numpy(dtype=np.float64)[-2 - volume_ma_period:-2].mean()
+        if vol_ma and vol_ma > 0:
+            vol_item = {'symbol': symbol, 'ratio': last_closed_candle['volume'] / vol_ma,
+                        'volume': last_closed_candle['volume'],
+                        'volume_ma': vol_ma}
+
+        if sentiment_conf.get('enabled', False) and index < 10:
+            if len(df) >= sentiment_conf.get('rsi_period', 14) + 1:
+                df['rsi'] = pta.rsi(df['close'], length=sentiment_conf.get('rsi_period', 14))
+                last_rsi = df['rsi'].iloc[-2]
+
+                if last_rsi is not None and not np.isnan(last_rsi):
+                    overbought_threshold = sentiment_conf.get('rsi_overbought', 70)
+                    oversold_threshold = sentiment_conf.get('rsi_oversold', 30)
+
+                    if overbought_threshold < last_rsi < 100:
+                        rsi_item = ('overbought', {'symbol': symbol, 'rsi': last_rsi})
+                    elif 0 < last_rsi < oversold_threshold:
+                        rsi_item = ('oversold', {'symbol': symbol, 'rsi': last_rsi})
+    except Exception as e:
+        logger.debug(f"扫描 {symbol} 报告时出错: {e}")
+    return gain_item, consec_item, vol_item, rsi_item
 
 
 def run_periodic_report(exchange, config, report_conf):
@@ -57,9 +95,9 @@ def run_periodic_report(exchange, config, report_conf):
     try:
         sentiment_conf = report_conf.get('market_sentiment', {})
 
-        _update_cache_for_report(exchange, config, report_conf)
-        if not cached_top_symbols:
-            logger.warning(f"'{report_name}' 中止：热门币种缓存为空。")
+        report_symbols = _get_report_symbols(exchange, config, report_conf)
+        if not report_symbols:
+            logger.warning(f"'{report_name}' 中止：热门币种列表为空。")
             return
 
         fear_greed_data = None
@@ -67,7 +105,7 @@ def run_periodic_report(exchange, config, report_conf):
             fear_greed_data = fetch_fear_greed_index()
 
         report_tf = report_conf.get('run_interval', '4h')
-        symbols_to_scan = cached_top_symbols[:report_conf.get('top_n_by_volume', 100)]
+        symbols_to_scan = report_symbols[:report_conf.get('top_n_by_volume', 100)]
 
         gainers_list, consecutive_up_list, volume_ratio_list = [], [], []
         overbought_list, oversold_list = [], []
@@ -76,54 +114,21 @@ def run_periodic_report(exchange, config, report_conf):
 
         required_len = max(200, sentiment_conf.get('rsi_period', 14) + 50)
 
-        for i, symbol in enumerate(symbols_to_scan):
-            try:
-                df = fetch_ohlcv_data(exchange, symbol, report_tf, limit=required_len)
-                if df is None or len(df) < report_conf.get('volume_ma_period', 20) + 2:
-                    continue
-
-                last_closed_candle = df.iloc[-2]
-                if last_closed_candle['open'] > 0:
-                    gainers_list.append({'symbol': symbol,
-                                         'gain': ((last_closed_candle['close'] - last_closed_candle['open']) /
-                                                  last_closed_candle['open']) * 100})
-
-                count = 0
-                for j in range(2, len(df) + 1):
-                    candle = df.iloc[-j]
-                    if candle['close'] > candle['open']:
-                        count += 1
-                    else:
-                        break
-                if count >= report_conf.get('min_consecutive_candles', 2):
-                    consecutive_up_list.append({'symbol': symbol, 'candles': count})
-
-                df['volume_ma'] = df['volume'].rolling(window=report_conf.get('volume_ma_period', 20)).mean().shift(1)
-                vol_ma = df.iloc[-2]['volume_ma']
-                if vol_ma and vol_ma > 0:
-                    volume_ratio_list.append(
-                        {'symbol': symbol, 'ratio': last_closed_candle['volume'] / vol_ma,
-                         'volume': last_closed_candle['volume'],
-                         'volume_ma': vol_ma})
-
-                if sentiment_conf.get('enabled', False) and i < 10:
-                    if len(df) >= sentiment_conf.get('rsi_period', 14) + 1:
-                        df['rsi'] = pta.rsi(df['close'], length=sentiment_conf.get('rsi_period', 14))
-                        last_rsi = df['rsi'].iloc[-2]
-
-                        if last_rsi is not None and not np.isnan(last_rsi):
-                            overbought_threshold = sentiment_conf.get('rsi_overbought', 70)
-                            oversold_threshold = sentiment_conf.get('rsi_oversold', 30)
-
-                            if overbought_threshold < last_rsi < 100:
-                                overbought_list.append({'symbol': symbol, 'rsi': last_rsi})
-                            elif 0 < last_rsi < oversold_threshold:
-                                oversold_list.append({'symbol': symbol, 'rsi': last_rsi})
-
-                time.sleep(exchange.rateLimit / 2000)
-            except Exception as e:
-                logger.debug(f"扫描 {symbol} 报告时出错: {e}")
-                continue
+        # 每个币种的拉取+分析互不依赖，交给线程池并发执行 (请求速率由共享令牌桶控制)；
+        # executor.map 按输入顺序返回结果，榜单顺序与串行时一致
+        max_workers = config.get('app_settings', {}).get('max_workers', 10)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ReportScan') as executor:
+            results = executor.map(
+                lambda args: _analyze_symbol_for_report(exchange, args[1], args[0], report_tf, required_len,
+                                                        report_conf, sentiment_conf),
+                enumerate(symbols_to_scan))
+            for gain_item, consec_item, vol_item, rsi_item in results:
+                if gain_item: gainers_list.append(gain_item)
+                if consec_item: consecutive_up_list.append(consec_item)
+                if vol_item: volume_ratio_list.append(vol_item)
+                if rsi_item:
+                    rsi_kind, item = rsi_item
+                    (overbought_list if rsi_kind == 'overbought' else oversold_list).append(item)
 
         now_str = datetime.now().strftime('%Y-%m-%d %H:%M')
         title = f"📰 {report_name} ({now_str}, {report_tf}周期)"
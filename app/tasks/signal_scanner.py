@@ -1,4 +1,6 @@
 # --- START OF FILE app/tasks/signal_scanner.py ---
+import threading
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from loguru import logger
 
@@ -12,16 +14,49 @@ from app.analysis.strategies import (
     check_ma_breakout,
     _get_params_for_timeframe
 )
-from app.services.data_fetcher import fetch_ohlcv_data, get_top_n_symbols_by_volume
-from app.state import cached_top_symbols
+from app.analysis.indicators import clear_indicator_cache
+from app.analysis.trend import clear_trend_cache
+from app.services.data_fetcher import (
+    fetch_ohlcv_incremental, fetch_funding_rates_bulk, get_top_n_symbols_by_volume, is_bad_symbol,
+    clear_bad_symbols
+)
+from app.state import cached_top_symbols, set_cached_top_symbols, is_top_symbols_cache_fresh
+from app.utils import resolve_quote_and_market, format_symbol
+
+# 保证同一时间只有一轮主扫描在运行；上一轮超时未结束时，新的触发直接跳过
+_cycle_lock = threading.Lock()
+# 程序退出时置位：尚未开始的币种任务直接返回，正在运行的扫描尽快结束
+_stop_event = threading.Event()
+# 后台刷新任务与主扫描可能同时发现缓存过期，只让其中一个去拉取行情
+_refresh_lock = threading.Lock()
+# (symbol, timeframe) -> 上一轮已分析过的最后一根已收盘K线的时间戳
+_last_closed_candle_ts = {}
+# 本轮扫描的错误计数 (错误类型 -> 次数)，循环结束时汇总输出一次
+_cycle_errors = Counter()
+_cycle_errors_lock = threading.Lock()
+
+def request_stop():
+    _stop_event.set()
+
+def _record_error(kind):
+    with _cycle_errors_lock:
+        _cycle_errors[kind] += 1
+
+def get_top_symbols_refresh_minutes(config):
+    """ 热门币种列表的后台刷新间隔 (分钟)，默认每 4 个扫描间隔刷新一次。 """
+    interval_minutes = config.get('app_settings', {}).get('check_interval_minutes', 15)
+    dyn_scan_conf = config.get('market_settings', {}).get('dynamic_scan', {})
+    return dyn_scan_conf.get('refresh_interval_minutes') or interval_minutes * 4
 
-def _get_symbol_in_primary_market(base_symbol, config):
-    primary_quote = config.get('market_settings', {}).get('dynamic_scan', {}).get('primary_quote_currency', 'USDT').upper()
-    market_type = config.get('app_settings', {}).get('default_market_type', 'swap')
-    if market_type == 'swap':
-        if primary_quote == "USDT": return f"{base_symbol.upper()}/USDT:USDT"
-        return f"{base_symbol.upper()}/{primary_quote}:{primary_quote}"
-    else: return f"{base_symbol.upper()}/{primary_quote}"
+def refresh_top_symbols(exchange, config, force=True):
+    """
+    由后台调度任务定期调用 (force=True)，在主扫描之外更新热门币种列表。
+    主扫描以 force=False 调用，只在缓存为空或已过期时才同步拉取。
+    """
+    if not config.get('market_settings', {}).get('dynamic_scan', {}).get('enabled', False): return
+    with _refresh_lock:
+        if not force and is_top_symbols_cache_fresh(): return
+        _update_cache(exchange, config)
 
 def _update_cache(exchange, config):
     logger.info(" (主扫描任务)正在更新热门币种缓存(K线分析用)...")
@@ -32,12 +67,16 @@ def _update_cache(exchange, config):
         market_type=config.get('app_settings', {}).get('default_market_type', 'swap'), config=config
     )
     static_bases = config.get('market_settings', {}).get('static_symbols', [])
-    static_symbols_list = [_get_symbol_in_primary_market(base, config) for base in static_bases]
+    primary_quote, market_type = resolve_quote_and_market(config)
+    static_symbols_list = [format_symbol(base, primary_quote, market_type) for base in static_bases]
+    # 拿到了最新的成交量排行，说明交易所接口与市场信息正常，之前被判定无效的交易对重新给一次机会
+    if dynamic_symbols_list: clear_bad_symbols()
     final_list = list(dynamic_symbols_list)
     for s in static_symbols_list:
         if s not in final_list: final_list.append(s)
-    cached_top_symbols.clear()
-    cached_top_symbols.extend(final_list)
+    # 有效期为两个刷新间隔：正常情况下后台任务会在过期前刷新，主扫描不必等待行情接口
+    ttl_seconds = get_top_symbols_refresh_minutes(config) * 60 * 2
+    set_cached_top_symbols(final_list, ttl_seconds=ttl_seconds)
     logger.info(f"✅ 主缓存更新完毕，共监控 {len(cached_top_symbols)} 个交易对。")
 
 STRATEGY_MAP = {
@@ -48,26 +87,79 @@ STRATEGY_MAP = {
     'level_breakout': {'func': check_level_breakout, 'limit': 400},
     'rsi_divergence': {'func': check_rsi_divergence, 'limit': 170},
     'trend_channel_breakout': {'func': check_trend_channel_breakout, 'limit': 350},
-    'consecutive_candles': {'func': check_consecutive_candles, 'limit': 50},
+    # closed_only: 只分析已收盘K线的策略，已收盘K线没有推进时本轮跳过。
+    # 开启 volume_confirm 时仍会读取当前未收盘K线的实时成交量，因此不跳过
+    'consecutive_candles': {'func': check_consecutive_candles, 'limit': 50, 'closed_only': True},
     'ob_luxalgo': {'func': check_ob_luxalgo, 'limit': 250},         # <-- 新引擎
     'ob_fluxcharts': {'func': check_ob_fluxcharts, 'limit': 250},   # <-- 新引擎
 }
 
-def _check_symbol_all_strategies(symbol, exchange, config):
+MAX_STRATEGY_LIMIT = max(s['limit'] for s in STRATEGY_MAP.values())
+# 按所需K线数量从少到多排序，轻量策略先执行
+STRATEGIES_BY_LIMIT = sorted(STRATEGY_MAP.items(), key=lambda kv: kv[1]['limit'])
+
+# 扫描计划只依赖配置，同一份配置只构建一次 (配置对象, (plan, scan_timeframes))
+_scan_plan_cache = (None, None)
+
+def _build_scan_plan(config):
+    """
+    生成扫描计划 {(策略名, 参数组序号): {周期: 最终参数}}。
+    enabled 与 exclude_timeframes 在这里一次性处理完，被排除的周期不会出现在内层字典中，
+    工作线程只需一次字典查找即可判断某个周期是否需要运行该策略。
+    同时返回至少有一个策略需要的周期列表 (保持配置中的顺序)。
+    """
     global_timeframes = config.get('market_settings', {}).get('timeframes', ['1h', '4h'])
-    for timeframe in global_timeframes:
-        max_limit = max(s['limit'] for s in STRATEGY_MAP.values())
-        df = fetch_ohlcv_data(exchange, symbol, timeframe, max_limit)
-        if df is None: continue
-        for name, strategy_info in STRATEGY_MAP.items():
-            raw_params_config = config['strategy_params'].get(name, {})
-            param_sets = raw_params_config if isinstance(raw_params_config, list) else [raw_params_config]
-            for i, base_params in enumerate(param_sets):
-                if not base_params.get('enabled', False): continue
+    plan = {}
+    for name, strategy_info in STRATEGIES_BY_LIMIT:
+        raw_params_config = config['strategy_params'].get(name, {})
+        param_sets = raw_params_config if isinstance(raw_params_config, list) else [raw_params_config]
+        for i, base_params in enumerate(param_sets):
+            if not base_params.get('enabled', False): continue
+            params_by_tf = {}
+            for timeframe in global_timeframes:
                 final_params = _get_params_for_timeframe(base_params, timeframe)
                 if timeframe in final_params.get('exclude_timeframes', []): continue
-                try: strategy_info['func'](exchange, symbol, timeframe, config, df.copy(), final_params, i)
-                except Exception as e: logger.error(f"执行策略 {name} on {symbol} {timeframe} 时发生错误: {e}")
+                params_by_tf[timeframe] = final_params
+            if params_by_tf:
+                plan[(name, i)] = params_by_tf
+    scan_timeframes = [tf for tf in global_timeframes if any(tf in by_tf for by_tf in plan.values())]
+    return plan, scan_timeframes
+
+def get_scan_plan(config):
+    """ 返回当前配置对应的扫描计划；配置对象换了 (重新加载) 才会重新构建。 """
+    global _scan_plan_cache
+    cached_config, cached_plan = _scan_plan_cache
+    if cached_config is not config:
+        cached_plan = _build_scan_plan(config)
+        _scan_plan_cache = (config, cached_plan)
+    return cached_plan
+
+def _check_symbol_all_strategies(symbol, exchange, config, plan, scan_timeframes, fetch_executor):
+    if _stop_event.is_set(): return symbol
+    # 该币种所有周期的K线并发拉取 (沿用上一轮缓存，只补拉增量)，哪个周期先拉取完成就先运行该周期的策略
+    fetches = {fetch_executor.submit(fetch_ohlcv_incremental, exchange, symbol, tf, MAX_STRATEGY_LIMIT): tf for tf in scan_timeframes}
+    for future in as_completed(fetches):
+        timeframe = fetches[future]
+        df = future.result()
+        if df is None:
+            _record_error('OHLCV获取失败')
+            continue
+        if df.empty: continue  # 新上市币种历史K线不足，不计为错误
+        closed_ts = int(df['timestamp'].iat[-2]) if len(df) >= 2 else None
+        key = (symbol, timeframe)
+        closed_unchanged = closed_ts is not None and _last_closed_candle_ts.get(key) == closed_ts
+        _last_closed_candle_ts[key] = closed_ts
+        for (name, i), params_by_tf in plan.items():
+            final_params = params_by_tf.get(timeframe)
+            if final_params is None: continue
+            if closed_unchanged and STRATEGY_MAP[name].get('closed_only') and not final_params.get('volume_confirm', False):
+                continue
+            # 策略只读取K线 (指标走数组缓存，不再往 df 上加列)，同一周期的所有策略共享同一份 df
+            try: STRATEGY_MAP[name]['func'](exchange, symbol, timeframe, config, df, final_params, i)
+            # 使用 loguru 的参数形式，消息只在确实输出时才格式化
+            except Exception as e:
+                _record_error(type(e).__name__)
+                logger.error("执行策略 {} on {} {} 时发生错误: {}: {}", name, symbol, timeframe, type(e).__name__, e)
     return symbol
 
 def _run_broad_funding_scan(exchange, config):
@@ -82,36 +174,76 @@ def _run_broad_funding_scan(exchange, config):
     )
     if not broad_symbols: return
     logger.info(f"   - 获取到 {len(broad_symbols)} 个交易对，正在检查费率...")
-    def check_funding_task(sym):
-        try: check_high_funding_rate(exchange, sym, '4h', config, None, fund_conf)
-        except Exception: pass
-    with ThreadPoolExecutor(max_workers=20, thread_name_prefix='FundScan') as executor:
+    def check_funding_task(sym, funding_data=None):
+        try: check_high_funding_rate(exchange, sym, '4h', config, None, fund_conf, funding_data=funding_data)
+        except Exception as e: logger.debug("检查 {} 资金费率时发生错误: {}", sym, e)
+
+    # 优先用一次批量请求取回全部费率，之后只在本地判断阈值
+    funding_rates = fetch_funding_rates_bulk(exchange, broad_symbols)
+    if funding_rates:
+        for sym in broad_symbols:
+            if sym in funding_rates: check_funding_task(sym, funding_rates[sym])
+        logger.info("✅ 资金费率大范围扫描完成。")
+        return
+    fetch_concurrency = config.get('app_settings', {}).get('fetch_concurrency', 20)
+    with ThreadPoolExecutor(max_workers=fetch_concurrency, thread_name_prefix='FundScan') as executor:
         for future in as_completed({executor.submit(check_funding_task, sym): sym for sym in broad_symbols}):
             pass
     logger.info("✅ 资金费率大范围扫描完成。")
 
 def run_signal_check_cycle(exchange, config):
+    if _stop_event.is_set(): return
+    if not _cycle_lock.acquire(blocking=False):
+        logger.warning("⏭️ 上一轮监控循环仍在运行，跳过本次触发。")
+        return
+    try:
+        _run_signal_check_cycle(exchange, config)
+    finally:
+        _cycle_lock.release()
+
+def _run_signal_check_cycle(exchange, config):
     logger.info("=" * 60)
     logger.info(f"🔄 开始执行监控循环...")
     try: _run_broad_funding_scan(exchange, config)
     except Exception as e: logger.error(f"资金费率扫描失败: {e}")
 
     dyn_scan_enabled = config.get('market_settings', {}).get('dynamic_scan', {}).get('enabled', False)
-    if dyn_scan_enabled: _update_cache(exchange, config)
+    # 热门币种列表由后台任务定期刷新；只有首次运行或后台刷新迟迟未成功 (缓存过期) 时才在这里同步获取
+    if dyn_scan_enabled: refresh_top_symbols(exchange, config, force=False)
     else:
         static_bases = config.get('market_settings', {}).get('static_symbols', [])
-        static_symbols_list = [_get_symbol_in_primary_market(base, config) for base in static_bases]
-        cached_top_symbols.clear()
-        cached_top_symbols.extend(static_symbols_list)
+        primary_quote, market_type = resolve_quote_and_market(config)
+        static_symbols_list = [format_symbol(base, primary_quote, market_type) for base in static_bases]
+        set_cached_top_symbols(static_symbols_list)
 
-    if not cached_top_symbols: return
-    logger.info(f"📊 开始 K 线技术分析扫描 (Top {len(cached_top_symbols)})...")
+    # 已确认无效的交易对不再提交扫描
+    symbols = [s for s in cached_top_symbols if not is_bad_symbol(s)]
+    if not symbols: return
+    logger.info(f"📊 开始 K 线技术分析扫描 (Top {len(symbols)})...")
     max_workers = config.get('app_settings', {}).get('max_workers', 10)
+    plan, scan_timeframes = get_scan_plan(config)
+    # 独立的K线拉取线程池，让每个扫描线程的多个周期同时发起请求 (总速率仍由令牌桶控制)
+    timeframe_count = max(len(scan_timeframes), 1)
+    fetch_concurrency = config.get('app_settings', {}).get('fetch_concurrency') or max_workers * timeframe_count
+    total = len(symbols)
+    _cycle_errors.clear()
 
-    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='TechScan') as executor:
-        for future in as_completed({executor.submit(_check_symbol_all_strategies, symbol, exchange, config): symbol for symbol in cached_top_symbols}):
-            try: future.result()
-            except Exception as e: logger.error(f"K线分析任务出错: {e}")
+    try:
+        with ThreadPoolExecutor(max_workers=fetch_concurrency, thread_name_prefix='OHLCVFetch') as fetch_executor, \
+                ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='TechScan') as executor:
+            futures = {executor.submit(_check_symbol_all_strategies, symbol, exchange, config, plan, scan_timeframes, fetch_executor): symbol for symbol in symbols}
+            for done, future in enumerate(as_completed(futures), 1):
+                try: future.result()
+                except Exception as e:
+                    _record_error(type(e).__name__)
+                    logger.error(f"K线分析任务出错: {type(e).__name__}: {e}")
+                if done % 20 == 0 or done == total:
+                    logger.debug("   - K线分析进度: {}/{}", done, total)
+    finally:
+        # 趋势与指标缓存只在本轮内有效，结束后清空以限制内存
+        clear_trend_cache()
+        clear_indicator_cache()
 
+    if _cycle_errors: logger.warning("⚠️ 本轮扫描错误统计: {}", dict(_cycle_errors))
     logger.info("✅ 全流程扫描完成")
 # --- END OF FILE app/tasks/signal_scanner.py ---
\ No newline at end of file
@@ -1,8 +1,25 @@
+import time
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+
+# 常用K线周期的分钟数，绝大多数调用直接命中此表
+_TF_MIN = {
+    '1m': 1, '3m': 3, '5m': 5, '15m': 15, '30m': 30,
+    '1h': 60, '2h': 120, '4h': 240, '6h': 360, '8h': 480, '12h': 720,
+    '1d': 1440, '3d': 4320, '1w': 10080,
+}
 
-ALERT_STATUS_FILE = 'cooldown_status.json'
 
 def timeframe_to_minutes(tf_str):
+    minutes = _TF_MIN.get(tf_str)
+    if minutes is not None:
+        return minutes
+    return _parse_timeframe_minutes(tf_str)
+
+
+@lru_cache(maxsize=64)
+def _parse_timeframe_minutes(tf_str):
     try:
         if not tf_str or len(tf_str) < 2: return 0
         num = int(tf_str[:-1]);
@@ -26,40 +43,37 @@ def calculate_cooldown_time(minutes, align_to_period_end=True):
                                 minutes 参数此时代表K线周期。
     :return: datetime 对象。
     """
-    now_utc = datetime.now(timezone.utc)
-
     if not align_to_period_end:
         # 传统模式：从现在开始加上指定的分钟数
+        now_utc = datetime.now(timezone.utc)
         if minutes <= 0: return now_utc + timedelta(minutes=1)
         return now_utc + timedelta(minutes=minutes)
-    else:
-        # 新模式：对齐到周期结束
-        # 此时 minutes 参数代表的是时间周期的分钟数
-        period_minutes = int(minutes)
-        if period_minutes <= 0: return now_utc + timedelta(minutes=1)
-
-        # 处理日线及以上周期
-        if period_minutes >= 1440:  # 1天 = 1440分钟
-            # 对齐到当天的午夜 (UTC)
-            period_end_time = (now_utc + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-            return period_end_time
 
-        # 计算自一天开始以来的总分钟数
-        total_minutes_of_day = now_utc.hour * 60 + now_utc.minute
+    # 新模式：对齐到周期结束，此时 minutes 参数代表的是时间周期的分钟数
+    # 全程使用 epoch 整数秒计算，只在返回时构造 datetime
+    now = int(time.time())
+    period_minutes = int(minutes)
+    if period_minutes <= 0: return datetime.fromtimestamp(now + 60, tz=timezone.utc)
 
-        # 计算当前时间点所属周期的开始分钟数
-        start_minute_of_period = (total_minutes_of_day // period_minutes) * period_minutes
+    # 日线及以上周期对齐到下一个 UTC 午夜；日内周期从当天 UTC 零点起按周期长度划分，对齐到下一个边界
+    # (不能直接对 epoch 取模：不能整除一天的周期，如 960 分钟，在不同日期的边界会错开)
+    day_start = now - now % 86400
+    period = 86400 if period_minutes >= 1440 else period_minutes * 60
+    period_end = day_start + ((now - day_start) // period + 1) * period
+    return datetime.fromtimestamp(period_end, tz=timezone.utc)
 
-        # 构建周期开始时间
-        period_start_time = now_utc.replace(hour=start_minute_of_period // 60,
-                                            minute=start_minute_of_period % 60,
-                                            second=0, microsecond=0)
 
-        # 周期结束时间 = 周期开始时间 + 周期长度
-        period_end_time = period_start_time + timedelta(minutes=period_minutes)
+def resolve_quote_and_market(config):
+    """ 从配置中读取主计价货币和市场类型，每个扫描周期只需调用一次。 """
+    primary_quote = config.get('market_settings', {}).get('dynamic_scan', {}).get('primary_quote_currency',
+                                                                                  'USDT').upper()
+    market_type = config.get('app_settings', {}).get('default_market_type', 'swap')
+    return primary_quote, market_type
 
-        # 如果计算出的结束时间早于现在（发生在边界情况，如21:59:59），则推到下一个周期
-        if period_end_time < now_utc:
-            period_end_time += timedelta(minutes=period_minutes)
 
-        return period_end_time
+@lru_cache(maxsize=4096)
+def format_symbol(base_symbol, primary_quote, market_type):
+    """ 将基础币种 (如 BTC) 转换为主市场中的完整交易对名称。 """
+    if market_type == 'swap':
+        return f"{base_symbol.upper()}/{primary_quote}:{primary_quote}"
+    return f"{base_symbol.upper()}/{primary_quote}"
@@ -31,6 +31,9 @@ if [ ! -f "cooldown_status.json" ]; then
     echo -e "${GREEN}✨ 初始化空的 cooldown_status.json 文件...${NC}"
     echo "{}" > cooldown_status.json
 fi
+
+# 3. 冷却状态数据库目录 (SQLite WAL 模式会在同目录生成 -wal/-shm 文件)
+mkdir -p data
 echo -e "${GREEN}状态文件准备完毕。${NC}\n"
 
 # --- 步骤 2: 重构并重启 Docker 服务 ---
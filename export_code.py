@@ -1,23 +1,22 @@
 # export_code.py (v2 - 自动检测当前目录)
 
 import os
-import sys
 
 # --- 用户配置区 START ---
 
 # 1. 排除的目录名：这些目录下的所有内容都将被忽略
-EXCLUDE_DIRS = {
+EXCLUDE_DIRS = frozenset({
     '.git', 'node_modules', 'venv', '__pycache__', 'dist', 'build',
     '.vscode', '.idea', 'env', 'bin', 'lib', 'obj',  # 常用虚拟环境、编译产物和IDE目录
-}
+})
 
 # 2. 排除的文件名：这些特定文件将被忽略
-EXCLUDE_FILES = {
+EXCLUDE_FILES = frozenset({
     'package-lock.json', 'yarn.lock', '.env', '.DS_Store', 'Thumbs.db'
-}
+})
 
 # 3. 排除的文件扩展名：这些类型的文件将被忽略 (注意前面的点'.')
-EXCLUDE_EXTENSIONS = {
+EXCLUDE_EXTENSIONS = frozenset({
     '.log', '.tmp', '.swp', '.bak', '.zip', '.rar', '.7z',
     # 媒体文件
     '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp',
@@ -27,24 +26,50 @@ EXCLUDE_EXTENSIONS = {
     '.db', '.sqlite3',
     # 编译产物
     '.pyc', '.o', '.so', '.dll', '.exe', '.class'
-}
+})
 
 
 # --- 用户配置区 END ---
 
 
-def get_file_content(file_path):
-    """尝试以UTF-8编码读取文件内容，如果失败则返回提示信息。"""
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def copy_file_content(file_path, outfile):
+    """以 UTF-8 分块流式复制文件内容到输出文件 (无法解码的字节会被替换)，保证内容以换行结尾。"""
+    try:
+        last_char = '\n'
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            while chunk := f.read(COPY_CHUNK_SIZE):
+                outfile.write(chunk)
+                last_char = chunk[-1]
+        if last_char != '\n':
+            outfile.write('\n')
+    except Exception as e:
+        outfile.write(f"--- [无法读取文件: {e}] ---\n")
+
+
+def _get_extension(filename):
+    """返回文件扩展名 (含点)，与 os.path.splitext 一致：以点开头的隐藏文件没有扩展名。"""
+    dot = filename.rfind('.')
+    if dot <= 0 or filename[:dot].strip('.') == '':
+        return ''
+    return filename[dot:]
+
+
+def _walk(root, exclude_files):
+    """基于 os.scandir 的递归遍历，直接跳过排除目录，按名称排序输出文件路径。"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception:
-        # 如果UTF-8失败，尝试用系统默认编码
-        try:
-            with open(file_path, 'r', encoding=sys.getdefaultencoding()) as f:
-                return f.read()
-        except Exception as e:
-            return f"--- [无法读取文件: {e}] ---"
+        with os.scandir(root) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name not in EXCLUDE_DIRS:
+                yield from _walk(entry.path, exclude_files)
+        elif entry.name not in exclude_files and _get_extension(entry.name) not in EXCLUDE_EXTENSIONS:
+            yield entry.path
 
 
 def main():
@@ -57,10 +82,9 @@ def main():
     parent_dir = os.path.dirname(project_path)
     output_file_path = os.path.join(parent_dir, output_filename)
 
-    # 动态排除脚本自身和输出文件
+    # 动态排除脚本自身和输出文件 (避免在同一目录时把自己打包)
     script_name = os.path.basename(__file__)
-    EXCLUDE_FILES.add(script_name)
-    EXCLUDE_FILES.add(output_filename)  # 避免在同一目录时把自己打包
+    exclude_files = EXCLUDE_FILES | {script_name, output_filename}
 
     print(f"▶️  开始扫描项目: {project_name}")
     print(f"   项目路径: {project_path}")
@@ -70,29 +94,20 @@ def main():
     with open(output_file_path, 'w', encoding='utf-8') as outfile:
         outfile.write(f"# 項目 '{project_name}' 的代碼合集\n\n")
 
-        for root, dirs, files in os.walk(project_path, topdown=True):
-            # 排除指定目录
-            dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS]
-
-            for filename in files:
-                # 排除指定文件和扩展名
-                if filename in EXCLUDE_FILES or os.path.splitext(filename)[1] in EXCLUDE_EXTENSIONS:
-                    continue
-
-                file_path = os.path.join(root, filename)
-                relative_path = os.path.relpath(file_path, project_path)
+        # 遍历时已排除指定目录、文件和扩展名
+        for file_path in _walk(project_path, exclude_files):
+            relative_path = os.path.relpath(file_path, project_path)
 
-                # 使用正斜杠作为路径分隔符，提高跨平台可读性
-                formatted_path = relative_path.replace(os.sep, '/')
+            # 使用正斜杠作为路径分隔符，提高跨平台可读性
+            formatted_path = relative_path.replace(os.sep, '/')
 
-                outfile.write("=" * 35 + f"  📄 {formatted_path}  " + "=" * 35 + "\n\n")
-                outfile.write("```\n")
+            outfile.write("=" * 35 + f"  📄 {formatted_path}  " + "=" * 35 + "\n\n")
+            outfile.write("```\n")
 
-                content = get_file_content(file_path)
-                outfile.write(content.strip() + "\n")
+            copy_file_content(file_path, outfile)
 
-                outfile.write("```\n\n\n")
-                file_count += 1
+            outfile.write("```\n\n\n")
+            file_count += 1
 
     print(f"✅ 成功！共处理了 {file_count} 个文件。")
     print(f"   所有代码已整合到文件 '{output_file_path}' 中。")
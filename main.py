@@ -20,28 +20,72 @@ import signal
 import threading
 
 import ccxt
-from apscheduler.schedulers.blocking import BlockingScheduler
-from apscheduler.triggers.cron import CronTrigger
-from apscheduler.triggers.interval import IntervalTrigger
+import requests
 from loguru import logger
+from requests.adapters import HTTPAdapter
 
 from app.config import load_config
 from app.logging_setup import setup_logging
+from app.scheduling import configure_scheduler, create_scheduler
+from app.services.data_fetcher import set_rate_limiter
 from app.services.notification_service import notification_consumer
-from app.state import load_alert_states, save_alert_states
+from app.services.rate_limiter import TokenBucket
+from app.state import close_alert_state_db, load_alert_states, start_alert_state_flusher
 from app.tasks.periodic_reporter import run_periodic_report
-from app.tasks.signal_scanner import run_signal_check_cycle
-from app.utils import timeframe_to_minutes
+from app.tasks.signal_scanner import request_stop, run_signal_check_cycle
+
+# 退出时需要关闭的全局资源，由 main 在创建后设置
+_scheduler = None
+_http_session = None
+# 等待进行中的任务结束并保存状态的最长时间，需小于容器的退出宽限期 (docker-compose 中的 stop_grace_period)
+SHUTDOWN_TIMEOUT_SECONDS = 20
+
+
+def _drain_and_close(scheduler_running):
+    """ 等进行中的扫描/报告任务结束后，再保存冷却状态、关闭 SQLite 与 HTTP 会话。 """
+    if scheduler_running:
+        # 停止触发新任务，并等待调度器线程池中正在运行的任务全部返回 (扫描任务收到停止信号后不再提交新币种)
+        _scheduler.shutdown(wait=True)
+    # 此时不再有任务写入冷却状态：写入剩余的脏数据后关闭 SQLite 连接 (含 WAL checkpoint)，避免下次启动时重放日志
+    close_alert_state_db()
+    if _http_session is not None:
+        _http_session.close()  # 释放连接池中的 keep-alive 连接
 
 
 def handle_exit(signum, frame):
     logger.info("\n👋 收到退出信号，正在保存状态并优雅关闭...")
-    save_alert_states()
-    logger.info("✅ 冷却状态已保存。程序退出。")
-    sys.exit(0)
+    # 通知扫描任务停止提交新的币种
+    request_stop()
+    scheduler_running = _scheduler is not None and _scheduler.running
+    # 信号处理函数运行在主线程上，主线程可能正持有状态锁 (例如首轮扫描中)，
+    # 因此在独立线程中等待任务结束并保存，限时等待，避免死锁或拖过容器的退出宽限期
+    saver = threading.Thread(target=_drain_and_close, args=(scheduler_running,), name='StateSaver')
+    saver.start()
+    saver.join(timeout=SHUTDOWN_TIMEOUT_SECONDS)
+    if saver.is_alive():
+        logger.warning("⚠️ 等待任务结束并保存冷却状态超时，程序将直接退出。")
+    else:
+        logger.info("✅ 冷却状态已保存。程序退出。")
+    logger.complete()  # 等待日志队列中的剩余消息全部输出
+    # 调度器已停止时 scheduler.start() 会自行返回；首轮运行期间 (调度器尚未启动) 仍需抛出 SystemExit 中断主线程
+    if not scheduler_running:
+        sys.exit(0)
+
+
+def build_http_session(pool_size=100):
+    """
+    供 ccxt 复用的 HTTP 会话：连接池保持 keep-alive，避免每个请求重新进行 TLS 握手。
+    传输层不做重试：失败 (包括 429 限流) 交给 ccxt 抛出异常，由 data_fetcher 的重试逻辑配合令牌桶统一处理。
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
 
 
 def main():
+    global _scheduler, _http_session
     signal.signal(signal.SIGINT, handle_exit);
     signal.signal(signal.SIGTERM, handle_exit)
     try:
@@ -52,11 +96,16 @@ def main():
     logger = setup_logging(config.get('app_settings', {}).get("log_level", "INFO"))
 
     load_alert_states()
+    start_alert_state_flusher()
 
     app_conf = config.get('app_settings', {})
+    _http_session = build_http_session()
     try:
+        # 关闭 ccxt 内置的串行限流，改由所有线程共享的令牌桶控制请求速率
+        # 所有线程共享同一个交易所实例和带连接池的 HTTP 会话
         exchange = getattr(ccxt, app_conf.get('exchange'))(
-            {'enableRateLimit': True, 'options': {'defaultType': app_conf.get('default_market_type')}})
+            {'enableRateLimit': False, 'options': {'defaultType': app_conf.get('default_market_type')},
+             'session': _http_session})
     except (AttributeError, KeyError) as e:
         logger.error(f"❌ 初始化交易所失败: 配置错误或交易所不支持 - {e}");
         return
@@ -64,9 +113,21 @@ def main():
         logger.error(f"❌ 初始化交易所时发生未知错误: {e}", exc_info=True);
         return
 
+    rate_limit_per_sec = app_conf.get('rate_limit_per_sec') or 1000 / exchange.rateLimit
+    # 桶容量即允许的突发请求数，默认与每秒速率相同 (最多一次性放行 1 秒的配额)
+    rate_limit_burst = app_conf.get('rate_limit_burst') or rate_limit_per_sec
+    set_rate_limiter(TokenBucket(capacity=rate_limit_burst, refill_rate=rate_limit_per_sec))
+
+    # 启动时一次性加载市场信息，避免首轮扫描中第一个请求触发耗时数秒的懒加载；之后所有任务复用该实例
+    try:
+        markets = exchange.load_markets()
+        logger.info(f"✅ 已加载 {len(markets)} 个交易市场。")
+    except Exception as e:
+        logger.warning(f"⚠️ 预加载市场信息失败，将在首次请求时重试: {e}")
+
     logger.info("🚀 终极监控与信号程序已启动")
     logger.info(
-        f"📊 交易所: {app_conf.get('exchange')} | 市场: {app_conf.get('default_market_type')} | 间隔: {app_conf.get('check_interval_minutes')} 分钟")
+        f"📊 交易所: {app_conf.get('exchange')} | 市场: {app_conf.get('default_market_type')} | 间隔: {app_conf.get('check_interval_minutes')} 分钟 | 限速: {rate_limit_per_sec:.1f} 次/秒")
 
     consumer_thread = threading.Thread(target=notification_consumer, daemon=True)
     consumer_thread.start()
@@ -86,41 +147,8 @@ def main():
                 except Exception as e:
                     logger.error(f"首次运行 '{report_conf.get('report_name')}' 失败: {e}", exc_info=True)
 
-    scheduler = BlockingScheduler(timezone='Asia/Shanghai')
-
-    if report_configs:
-        logger.info("正在配置周期性报告任务...")
-        for idx, report_conf in enumerate(report_configs):
-            if report_conf.get('enabled', False):
-                report_name = report_conf.get('report_name', f'报告任务-{idx + 1}')
-                run_interval_str = report_conf.get('run_interval', '4h')
-
-                run_interval_minutes = timeframe_to_minutes(run_interval_str)
-                if run_interval_minutes == 0 or (run_interval_minutes < 1440 and 1440 % run_interval_minutes != 0):
-                    logger.error(
-                        f"❌ 报告 '{report_name}' 的间隔 '{run_interval_str}' 无效 (无法被24小时整除)，将跳过此任务。")
-                    continue
-
-                if run_interval_str == '1d':
-                    # 日报，在北京时间每天早上8点运行
-                    # 关键修改：显式添加 timezone='Asia/Shanghai'
-                    trigger = CronTrigger(hour='8', minute='0', second='10', timezone='Asia/Shanghai')
-                else:  # 小时报告
-                    run_interval_hours = run_interval_minutes // 60
-                    trigger_hours = ",".join([str(h) for h in range(0, 24, run_interval_hours)])
-                    # 关键修改：显式添加 timezone='Asia/Shanghai'
-                    trigger = CronTrigger(hour=trigger_hours, minute='0', second='10', timezone='Asia/Shanghai')
-
-                scheduler.add_job(run_periodic_report,
-                                  trigger,
-                                  args=[exchange, config, report_conf],
-                                  name=report_name)
-                logger.info(f"   - ✅ 已添加 '{report_name}'，调度规则: {trigger}。")
-
-    interval_minutes = app_conf.get('check_interval_minutes', 15)
-    scheduler.add_job(run_signal_check_cycle, IntervalTrigger(minutes=interval_minutes), args=[exchange, config],
-                      name="SignalCheckCycle")
-    logger.info(f"   - 动态热点监控任务已添加，每 {interval_minutes} 分钟运行一次。")
+    scheduler = _scheduler = create_scheduler()
+    configure_scheduler(scheduler, exchange, config)
 
     logger.info(f"\n📅 调度器已启动，请保持程序运行。按 Ctrl+C 退出。")
     try:
@@ -0,0 +1,125 @@
+# --- START OF FILE tests/test_fast_indicators.py ---
+# numba 指标内核与真实 pandas_ta 0.4.71b0 输出的逐点对比。
+# tests/data/pandas_ta_0.4.71b0.csv 是 pandas_ta 对固定输入的录制结果，始终参与测试；
+# 环境中能导入 pandas_ta 时，再额外在随机数据上与其实时结果对比。
+# 重新录制 (需安装 pandas_ta 0.4.71b0)：python -m tests.test_fast_indicators
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.analysis import fast_indicators
+
+_RECORDED_PATH = Path(__file__).parent / 'data' / 'pandas_ta_0.4.71b0.csv'
+
+# pandas_ta 列名 -> (numba 内核, 对应的 pandas_ta 调用)；pandas_ta 数据不足时返回 None，对应内核的全 NaN
+_INDICATORS = {
+    'EMA_10': (lambda h, l, c: fast_indicators.ema(c, 10), lambda ta, h, l, c: ta.ema(c, 10, talib=False)),
+    'EMA_21': (lambda h, l, c: fast_indicators.ema(c, 21), lambda ta, h, l, c: ta.ema(c, 21, talib=False)),
+    'ATRr_10': (lambda h, l, c: fast_indicators.atr(h, l, c, 10), lambda ta, h, l, c: ta.atr(h, l, c, 10, talib=False)),
+    'ATRr_14': (lambda h, l, c: fast_indicators.atr(h, l, c, 14), lambda ta, h, l, c: ta.atr(h, l, c, 14, talib=False)),
+    'K_9_3': (lambda h, l, c: fast_indicators.kdj(h, l, c, 9, 3)[0], lambda ta, h, l, c: _column(ta.kdj(h, l, c, 9, 3), 'K_9_3')),
+    'D_9_3': (lambda h, l, c: fast_indicators.kdj(h, l, c, 9, 3)[1], lambda ta, h, l, c: _column(ta.kdj(h, l, c, 9, 3), 'D_9_3')),
+    'K_5_3': (lambda h, l, c: fast_indicators.kdj(h, l, c, 5, 3)[0], lambda ta, h, l, c: _column(ta.kdj(h, l, c, 5, 3), 'K_5_3')),
+    'D_5_3': (lambda h, l, c: fast_indicators.kdj(h, l, c, 5, 3)[1], lambda ta, h, l, c: _column(ta.kdj(h, l, c, 5, 3), 'D_5_3')),
+    'RSI_2': (lambda h, l, c: fast_indicators.rsi(c, 2), lambda ta, h, l, c: ta.rsi(c, 2, talib=False)),
+    'RSI_5': (lambda h, l, c: fast_indicators.rsi(c, 5), lambda ta, h, l, c: ta.rsi(c, 5, talib=False)),
+    'RSI_14': (lambda h, l, c: fast_indicators.rsi(c, 14), lambda ta, h, l, c: ta.rsi(c, 14, talib=False)),
+    'RSI_30': (lambda h, l, c: fast_indicators.rsi(c, 30), lambda ta, h, l, c: ta.rsi(c, 30, talib=False)),
+}
+
+
+def _column(frame, name):
+    return None if frame is None else frame[name]
+
+
+def _random_ohlc(seed, n, flat=False):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    high = close + np.abs(rng.normal(0, 1, n))
+    low = close - np.abs(rng.normal(0, 1, n))
+    if flat:
+        # 取整并插入一段横盘，制造零区间，覆盖 non_zero_range 的 epsilon 分支
+        close, high, low = np.round(close), np.round(high), np.round(low)
+        high[n // 3:n // 3 + 15] = low[n // 3:n // 3 + 15] = close[n // 3:n // 3 + 15] = close[n // 3]
+    return high, low, close
+
+
+def _flat_start_ohlc():
+    # 前 20 根K线完全不动，之后才开始波动
+    high, low, close = _random_ohlc(3, 40)
+    high[:20] = low[:20] = close[:20] = 100.0
+    return high, low, close
+
+
+def _pandas_ta_values(ta, name, high, low, close):
+    result = _INDICATORS[name][1](ta, pd.Series(high), pd.Series(low), pd.Series(close))
+    return np.full(close.size, np.nan) if result is None else result.to_numpy(dtype=np.float64)
+
+
+def _assert_same(actual, expected):
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def _recorded_frames():
+    recorded = pd.read_csv(_RECORDED_PATH, float_precision='round_trip')
+    return {case: frame.reset_index(drop=True) for case, frame in recorded.groupby('case', sort=False)}
+
+
+@pytest.mark.parametrize('name', list(_INDICATORS))
+@pytest.mark.parametrize('case', ['random', 'rounded', 'flat_start'])
+def test_kernels_match_recorded_pandas_ta(case, name):
+    frame = _recorded_frames()[case]
+    high, low, close = (frame[c].to_numpy(dtype=np.float64) for c in ('high', 'low', 'close'))
+    _assert_same(_INDICATORS[name][0](high, low, close), frame[name].to_numpy(dtype=np.float64))
+
+
+@pytest.mark.parametrize('name', list(_INDICATORS))
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('flat', [False, True])
+def test_kernels_match_live_pandas_ta(name, seed, flat):
+    ta = pytest.importorskip('pandas_ta')
+    # 长度从 5 到 328，覆盖数据不足 (pandas_ta 返回 None) 与刚好形成的边界
+    high, low, close = _random_ohlc(seed, 5 + seed * 17, flat)
+    _assert_same(_INDICATORS[name][0](high, low, close), _pandas_ta_values(ta, name, high, low, close))
+
+
+def test_short_input_returns_all_nan():
+    # pandas_ta 在数据不足时返回 None (ema: < length，atr/rsi: < length + 1，kdj: < length + signal + 1)
+    high, low, close = _random_ohlc(0, 12)
+    assert np.isnan(fast_indicators.ema(close[:9], 10)).all()
+    assert np.isnan(fast_indicators.rsi(close[:10], 10)).all()
+    assert np.isnan(fast_indicators.atr(high[:10], low[:10], close[:10], 10)).all()
+    assert all(np.isnan(x).all() for x in fast_indicators.kdj(high, low, close, 9, 3))
+
+
+@pytest.mark.parametrize('length', [2, 5, 14, 30])
+def test_rsi_matches_pandas(length):
+    # pandas_ta 的 RSI 没有 length 根的预热期：NaN 只出现在首根K线，以及价格从开头起一直未变动的区间 (0/0)
+    for frame in _recorded_frames().values():
+        close = frame['close'].to_numpy(dtype=np.float64)
+        expected = frame[f'RSI_{length}'].to_numpy(dtype=np.float64)
+        _assert_same(fast_indicators.rsi(close, length), expected)
+        expected_nan = ~np.maximum.accumulate(np.diff(close, prepend=close[0]) != 0)
+        np.testing.assert_array_equal(np.isnan(expected), expected_nan)
+
+
+def _record():
+    import pandas_ta as ta
+    assert ta.version == '0.4.71b0', ta.version
+    frames = []
+    for case, (high, low, close) in (('random', _random_ohlc(1, 200)), ('rounded', _random_ohlc(2, 120, flat=True)),
+                                     ('flat_start', _flat_start_ohlc())):
+        frame = pd.DataFrame({'case': case, 'high': high, 'low': low, 'close': close})
+        for name in _INDICATORS:
+            frame[name] = _pandas_ta_values(ta, name, high, low, close)
+        frames.append(frame)
+    _RECORDED_PATH.parent.mkdir(exist_ok=True)
+    pd.concat(frames).to_csv(_RECORDED_PATH, index=False)
+
+
+if __name__ == '__main__':
+    _record()
+# --- END OF FILE tests/test_fast_indicators.py ---
@@ -0,0 +1,135 @@
+# --- START OF FILE tests/test_order_blocks.py ---
+# numba 版订单块检测与原先逐K线 iloc 循环实现的对比，参考实现保留原逻辑 (ATR 改用已单独验证的 fast_indicators.atr)。
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.analysis import fast_indicators
+from app.analysis.order_blocks import find_flux_order_blocks, find_lux_order_blocks
+
+
+def _reference_lux(df, swing_length=5):
+    length = swing_length
+    if len(df) < length * 2 + 1: return None, None
+
+    bull_obs, bear_obs = [], []
+
+    for i in range(length, len(df) - length):
+        vol_center = df['volume'].iloc[i]
+        vol_left_max = df['volume'].iloc[i - length:i].max()
+        vol_right_max = df['volume'].iloc[i + 1:i + length + 1].max()
+
+        if (vol_center > vol_left_max) and (vol_center > vol_right_max):
+            high_center = df['high'].iloc[i]
+            low_center = df['low'].iloc[i]
+            local_highest = df['high'].iloc[i - length:i].max()
+            local_lowest = df['low'].iloc[i - length:i].min()
+
+            if high_center >= local_highest:
+                bear_obs.append({
+                    'top': high_center, 'bottom': (high_center + low_center) / 2,
+                    'index': i, 'timestamp': df['timestamp'].iloc[i], 'type': 'bearish'
+                })
+            elif low_center <= local_lowest:
+                bull_obs.append({
+                    'top': (high_center + low_center) / 2, 'bottom': low_center,
+                    'index': i, 'timestamp': df['timestamp'].iloc[i], 'type': 'bullish'
+                })
+
+    valid_bull_obs = [ob for ob in bull_obs if not (df['low'].iloc[ob['index'] + 1:] < ob['bottom']).any()]
+    valid_bear_obs = [ob for ob in bear_obs if not (df['high'].iloc[ob['index'] + 1:] > ob['top']).any()]
+
+    return (valid_bull_obs[-1] if valid_bull_obs else None), (valid_bear_obs[-1] if valid_bear_obs else None)
+
+
+def _reference_flux(df, swing_length=10, atr_multiplier=3.5):
+    if len(df) < swing_length * 2 + 1: return None, None
+
+    df_copy = df.copy()
+    df_copy['ATRr_10'] = fast_indicators.atr(df_copy['high'].to_numpy(dtype=np.float64),
+                                             df_copy['low'].to_numpy(dtype=np.float64),
+                                             df_copy['close'].to_numpy(dtype=np.float64), 10)
+    atr_col = "ATRr_10"
+
+    df_copy['is_swing_high'] = df_copy['high'] == df_copy['high'].rolling(window=swing_length * 2 + 1,
+                                                                          center=True).max()
+    df_copy['is_swing_low'] = df_copy['low'] == df_copy['low'].rolling(window=swing_length * 2 + 1, center=True).min()
+
+    bull_obs, bear_obs = [], []
+    last_swing_high_idx, last_swing_low_idx = None, None
+    high_crossed, low_crossed = True, True
+
+    for i in range(swing_length, len(df_copy)):
+        check_idx = i - swing_length
+        if df_copy['is_swing_high'].iloc[check_idx]:
+            last_swing_high_idx = check_idx
+            high_crossed = False
+        if df_copy['is_swing_low'].iloc[check_idx]:
+            last_swing_low_idx = check_idx
+            low_crossed = False
+
+        current_close = df_copy['close'].iloc[i]
+        current_atr = df_copy[atr_col].iloc[i] if atr_col in df_copy.columns else 0
+
+        if last_swing_high_idx is not None and not high_crossed:
+            if current_close > df_copy['high'].iloc[last_swing_high_idx]:
+                high_crossed = True
+                search_df = df_copy.iloc[last_swing_high_idx:i]
+                if not search_df.empty:
+                    lowest_idx = search_df['low'].idxmin()
+                    top, bottom = df_copy['high'].iloc[lowest_idx], df_copy['low'].iloc[lowest_idx]
+                    if (top - bottom) <= current_atr * atr_multiplier or current_atr == 0:
+                        bull_obs.append({'top': top, 'bottom': bottom, 'break_idx': i,
+                                         'timestamp': df_copy['timestamp'].iloc[lowest_idx], 'type': 'bullish'})
+
+        if last_swing_low_idx is not None and not low_crossed:
+            if current_close < df_copy['low'].iloc[last_swing_low_idx]:
+                low_crossed = True
+                search_df = df_copy.iloc[last_swing_low_idx:i]
+                if not search_df.empty:
+                    highest_idx = search_df['high'].idxmax()
+                    top, bottom = df_copy['high'].iloc[highest_idx], df_copy['low'].iloc[highest_idx]
+                    if (top - bottom) <= current_atr * atr_multiplier or current_atr == 0:
+                        bear_obs.append({'top': top, 'bottom': bottom, 'break_idx': i,
+                                         'timestamp': df_copy['timestamp'].iloc[highest_idx], 'type': 'bearish'})
+
+    valid_bull_obs = [ob for ob in bull_obs if not (df_copy['low'].iloc[ob['break_idx'] + 1:] < ob['bottom']).any()]
+    valid_bear_obs = [ob for ob in bear_obs if not (df_copy['high'].iloc[ob['break_idx'] + 1:] > ob['top']).any()]
+
+    return (valid_bull_obs[-1] if valid_bull_obs else None), (valid_bear_obs[-1] if valid_bear_obs else None)
+
+
+def _random_frame(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(30, 400))
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    if seed % 5 == 0:
+        close = np.round(close)  # 制造价格相等的K线，覆盖 >= / <= 与 idxmin/idxmax 取首个的分支
+    high = close + np.abs(rng.normal(0, 1, n))
+    low = close - np.abs(rng.normal(0, 1, n))
+    open_ = close + rng.normal(0, 0.5, n)
+    volume = rng.integers(1, 50, n).astype(float) if seed % 3 == 0 else rng.random(n) * 1000
+    return pd.DataFrame({'timestamp': np.arange(n, dtype=np.int64) * 60000, 'open': open_,
+                         'high': np.maximum(high, np.maximum(open_, close)),
+                         'low': np.minimum(low, np.minimum(open_, close)), 'close': close, 'volume': volume})
+
+
+def _normalize(obs):
+    return [None if ob is None else {k: (v if k == 'type' else float(v) if k in ('top', 'bottom') else int(v))
+                                     for k, v in ob.items()} for ob in obs]
+
+
+@pytest.mark.parametrize('seed', range(200))
+@pytest.mark.parametrize('swing_length', [3, 5, 10])
+def test_lux_order_blocks_match_reference(seed, swing_length):
+    df = _random_frame(seed)
+    assert _normalize(find_lux_order_blocks(df, swing_length)) == _normalize(_reference_lux(df, swing_length))
+
+
+@pytest.mark.parametrize('seed', range(200))
+@pytest.mark.parametrize('swing_length', [3, 5, 10])
+def test_flux_order_blocks_match_reference(seed, swing_length):
+    df = _random_frame(seed)
+    assert (_normalize(find_flux_order_blocks(df, swing_length, 3.5))
+            == _normalize(_reference_flux(df, swing_length, 3.5)))
+# --- END OF FILE tests/test_order_blocks.py ---